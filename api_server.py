@@ -0,0 +1,327 @@
+import json
+import threading
+import time
+import numpy as np
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+from config import Config
+import events
+import metrics
+
+class ApiRequestHandler(BaseHTTPRequestHandler):
+    server_version = "EasyNetworkManager"
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def do_GET(self):
+        api = self.server.api
+        url = urlsplit(self.path)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        
+        try:
+            if url.path == '/api/events':
+                self._stream_events(api, params)
+                return
+            if url.path == '/metrics':
+                self._send_metrics()
+                return
+            
+            route = api.routes.get(url.path)
+            if route is None and url.path.startswith('/api/devices/'):
+                ip, _, detail = url.path[len('/api/devices/'):].partition('/')
+                route = {'': api.device_detail, 'latency': api.device_latency, 'ports': api.device_ports}.get(detail)
+                params['ip'] = ip
+            if route is None:
+                self._send_error(404, "Not found")
+                return
+            
+            cached = api.get_cached(route, url.path, params)
+            if cached is None:
+                self._send_error(404, "Not found")
+                return
+            etag, body = cached
+            
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+            
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            self.wfile.write(body)
+        except ValueError as e:
+            self._send_error(400, str(e))
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+    
+    def do_POST(self):
+        api = self.server.api
+        url = urlsplit(self.path)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        
+        # A cross-site form or fetch can only send a simple request, which cannot carry this content type
+        content_type = self.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type != 'application/json':
+            self._send_error(415, "Content-Type must be application/json")
+            return
+        
+        try:
+            # Port scans are started on request and answered once they finish
+            if url.path == '/api/ports' and 'network' in params:
+                result = api.scan_ports(params, network=params['network'])
+            elif url.path.startswith('/api/devices/') and url.path.endswith('/ports'):
+                ip = url.path[len('/api/devices/'):-len('/ports')]
+                result = api.scan_ports(params, ips=[ip])
+                result = result.get(ip) if result is not None else None
+            else:
+                result = None
+            if result is None:
+                self._send_error(404, "Not found")
+                return
+            self._send_json(result)
+        except ValueError as e:
+            self._send_error(400, str(e))
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+    
+    def _send_json(self, result):
+        body = json.dumps(result, separators=(',', ':')).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _send_metrics(self):
+        body = metrics.REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', metrics.MetricsRegistry.CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        
+    def _send_error(self, code, message):
+        body = json.dumps({'error': message}).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _stream_events(self, api, params):
+        types = events.ALL_EVENTS
+        if 'types' in params:
+            types = tuple(t for t in params['types'].split(',') if t in events.ALL_EVENTS)
+            if not types:
+                raise ValueError("no known event types requested")
+        
+        subscription = api.data_handler.subscribe(types)
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Connection', 'keep-alive')
+            self.end_headers()
+            self.wfile.write(b"retry: 3000\n\n")
+            self.wfile.flush()
+            
+            while api.running:
+                event = subscription.get(timeout=Config.API_SSE_HEARTBEAT)
+                if event is None:
+                    # Comment lines keep proxies from closing an idle stream
+                    self.wfile.write(b": keepalive\n\n")
+                else:
+                    payload = json.dumps({
+                        'key': event.key,
+                        'data': api.encode_event_data(event.data),
+                        'generation': event.generation,
+                        'timestamp': event.timestamp
+                    })
+                    self.wfile.write(f"id: {event.generation}\nevent: {event.type}\ndata: {payload}\n\n".encode())
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError, OSError):
+            pass
+        finally:
+            subscription.close()
+
+class ApiServer:
+    def __init__(self, data_handler, host=None, port=None, network_monitor=None):
+        self.config = Config()
+        self.data_handler = data_handler
+        self.network_monitor = network_monitor
+        self.host = host or self.config.API_HOST
+        self.port = port if port is not None else self.config.API_PORT
+        self.running = False
+        self.httpd = None
+        self.thread = None
+        
+        # Encoded bodies keyed by (path, params) and tagged with the generation they were built from
+        self.cache = {}
+        self.cache_lock = threading.Lock()
+        
+        self.routes = {
+            '/api/devices': self.devices,
+            '/api/summary': self.summary,
+            '/api/history': self.history,
+            '/api/interfaces': self.interfaces
+        }
+    
+    def start(self):
+        self.httpd = ThreadingHTTPServer((self.host, self.port), ApiRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.api = self
+        self.port = self.httpd.server_address[1]
+        self.running = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        print(f"API server listening on http://{self.host}:{self.port}")
+    
+    def stop(self):
+        self.running = False
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+    
+    def get_cached(self, route, path, params):
+        snapshot = self.data_handler.get_snapshot()
+        generation, builder = route(snapshot, params)
+        key = (path, tuple(sorted(params.items())))
+        
+        with self.cache_lock:
+            cached = self.cache.get(key)
+        if cached is not None and cached[0] == generation:
+            return cached[1], cached[2]
+        
+        result = builder()
+        if result is None:
+            return None
+        etag = f'"{generation}"'
+        body = json.dumps(result, separators=(',', ':')).encode()
+        
+        with self.cache_lock:
+            if len(self.cache) >= self.config.API_CACHE_SIZE:
+                self.cache.clear()
+            self.cache[key] = (generation, etag, body)
+        return etag, body
+    
+    def encode_event_data(self, data):
+        if hasattr(data, 'to_dict'):
+            return data.to_dict()
+        return data
+    
+    def devices(self, snapshot, params):
+        status = params.get('status')
+        
+        def build():
+            if status == 'online':
+                devices = snapshot.online_devices
+            elif status:
+                devices = [d for d in snapshot.devices if d.status == status]
+            else:
+                devices = snapshot.devices
+            return {
+                'generation': snapshot.device_generation,
+                'devices': [device.to_dict() for device in devices]
+            }
+        return snapshot.device_generation, build
+    
+    def device_detail(self, snapshot, params):
+        def build():
+            device = snapshot.devices_by_ip.get(params['ip'])
+            return device.to_dict() if device is not None else None
+        return snapshot.device_generation, build
+    
+    def device_latency(self, snapshot, params):
+        def build():
+            summary = self.data_handler.get_latency_stats(params['ip'])
+            series = self.data_handler.get_latency_series(params['ip'])
+            if summary is None or series is None:
+                return None
+            times, rtts = series
+            return {
+                'ip': params['ip'],
+                'summary': summary,
+                'timestamp': times.tolist(),
+                # Lost probes are null rather than NaN, which JSON cannot carry
+                'rtt_ms': [None if rtt != rtt else rtt for rtt in rtts.tolist()]
+            }
+        return self.data_handler.get_latency_generation(), build
+        
+    def device_ports(self, snapshot, params):
+        inventory = self.network_monitor.get_port_inventory(params['ip']) if self.network_monitor else None
+        # Keyed on the scan time, so a rescan or an expired inventory never serves a stale body
+        return (inventory['scanned_at'] if inventory else 0), lambda: inventory
+    
+    def scan_ports(self, params, ips=None, network=None):
+        if self.network_monitor is None:
+            return None
+        banners = params['banners'] not in ('0', 'false') if 'banners' in params else None
+        refresh = params.get('refresh') in ('1', 'true')
+        if network is not None:
+            return self.network_monitor.scan_subnet_ports(network, params.get('ports'), banners, refresh)
+        # Only devices discovery already found, so the API cannot be pointed at arbitrary addresses
+        known = self.data_handler.get_snapshot().devices_by_ip
+        if not all(ip in known for ip in ips):
+            return None
+        return self.network_monitor.scan_ports(ips, params.get('ports'), banners, refresh)
+        
+    def interfaces(self, snapshot, params):
+        def build():
+            return {
+                'generation': snapshot.stats_generation,
+                'interfaces': {name: snapshot.latest_interfaces[name] for name in sorted(snapshot.latest_interfaces)}
+            }
+        return snapshot.stats_generation, build
+        
+    def summary(self, snapshot, params):
+        return snapshot.generation, self.data_handler.get_summary_stats
+    
+    def history(self, snapshot, params):
+        def build():
+            if 'interface' in params:
+                return build_interface()
+            if 'window' in params:
+                now = time.time()
+                max_points = int(params['max_points']) if 'max_points' in params else None
+                result = self.data_handler.query_stats(now - float(params['window']), now, max_points)
+                history = {'resolution': result['resolution']}
+                for name, value in result.items():
+                    if isinstance(value, dict):
+                        history[name] = {stat: column.tolist() for stat, column in value.items()}
+                    elif name != 'resolution':
+                        history[name] = value.tolist()
+            else:
+                count = int(params.get('count', 60))
+                columns = self.data_handler.get_stats_columns(count)
+                history = {name: column.tolist() for name, column in columns.items()}
+            history['generation'] = snapshot.stats_generation
+            return history
+        
+        def build_interface():
+            # Per-interface history only keeps raw samples, so windows are cut from those
+            count = None if 'window' in params else int(params.get('count', 60))
+            self.data_handler.watch_interface(params['interface'])
+            columns = self.data_handler.get_interface_columns(params['interface'], count)
+            if columns is None:
+                return None
+            history = {name: column.tolist() for name, column in columns.items()}
+            if 'window' in params:
+                start = time.time() - float(params['window'])
+                first = int(np.searchsorted(columns['timestamp'], start))
+                history = {name: values[first:] for name, values in history.items()}
+            history['interface'] = params['interface']
+            history['generation'] = snapshot.stats_generation
+            return history
+            
+        # Parse up front so malformed parameters are reported before anything is cached
+        for name in ('window', 'max_points', 'count'):
+            if name in params:
+                float(params[name])
+        return snapshot.stats_generation, build
\ No newline at end of file
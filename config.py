@@ -3,6 +3,7 @@ class Config:
     SCANNING_METHODS = {
         'ping': 'Use ICMP ping (traditional method)',
         'socket': 'Use socket connections to common ports',
+        'icmp': 'Use in-process ICMP echo sweep (no ping subprocess)',
         'hybrid': 'Try ping first, fallback to socket',
         'auto': 'Automatically detect best method'
     }
@@ -12,28 +13,105 @@ class Config:
     PING_TIMEOUT = 3
     PING_COUNT = 1
     
+    ICMP_TIMEOUT = 1
+    ICMP_RECV_BUFFER = 1 << 20
+    
     SOCKET_TIMEOUT = 1
     COMMON_PORTS = [80, 443, 22, 23, 53, 135, 139, 445, 3389, 8080, 21, 25, 110, 993, 995]
-    SOCKET_THREADS = 30
+    PROBE_MAX_IN_FLIGHT = 1024
+    PROBE_PORT_COUNT = 5
+    PROBE_CACHE_TTL = 4
+    PROBE_WAIT_TIMEOUT = 30
+    # Shared by every scan path: probes (echoes, connects, ping processes) per second, 0 for no limit
+    PROBE_RATE_LIMIT = 2000
+    # Probes that may go out back to back before pacing starts; kept small so sweeps never arrive as a flood
+    PROBE_RATE_BURST = 50
+    PROBE_GLOBAL_IN_FLIGHT = 1024
+    ARP_DISCOVERY_ENABLED = True
+    ARP_SOLICIT_ENABLED = False
+    ARP_SOLICIT_WAIT = 1.0
+    
+    # None scans every port in PORT_SERVICES; otherwise a spec such as '1-1024,3389,8080'
+    PORT_SCAN_PORTS = None
+    PORT_SCAN_RATE = 2000
+    PORT_SCAN_BURST = 50
+    PORT_SCAN_MAX_IN_FLIGHT = 512
+    PORT_SCAN_TIMEOUT = 1
+    PORT_SCAN_BANNERS = True
+    PORT_SCAN_BANNER_TIMEOUT = 1.5
+    PORT_SCAN_BANNER_BYTES = 512
+    PORT_SCAN_BANNER_LENGTH = 120
+    PORT_SCAN_HTTP_PORTS = (80, 8000, 8008, 8080, 8888)
+    PORT_SCAN_TLS_PORTS = (443, 993, 995, 8443)
+    PORT_SCAN_CACHE_TTL = 900
     
     MAX_SCAN_THREADS = 50
-    MAX_STATUS_THREADS = 20
+    
+    DNS_RESOLVER_THREADS = 8
+    DNS_CACHE_TTL = 3600
+    DNS_NEGATIVE_TTL = 300
+    DNS_CALLBACK_DELAY = 0.25
     
     SCAN_INTERVAL = 30
     STATUS_UPDATE_INTERVAL = 5
     STATS_UPDATE_INTERVAL = 5
     GUI_REFRESH_INTERVAL = 10
+    GUI_EVENT_POLL_INTERVAL = 500
+    HEADLESS_STATUS_INTERVAL = 60
+    TASK_JITTER = 0.1
+    
+    EVENT_QUEUE_SIZE = 1000
+    RTT_CHANGE_THRESHOLD_MS = 20
+    RTT_CHANGE_RATIO = 0.5
     
-    MAX_STATS_HISTORY = 300
+    SCHEDULER_LIVE_INTERVAL = 15
+    SCHEDULER_RECENT_INTERVAL = 5
+    SCHEDULER_RECENT_CHANGE_WINDOW = 60
+    SCHEDULER_MAX_BACKOFF = 600
+    SCHEDULER_SWEEP_PERIOD = 300
+    SCHEDULER_LIVENESS_ALPHA = 0.2
+    SCHEDULER_FORGET_AFTER_MISSES = 8
+    SCHEDULER_FORGET_LIVENESS = 0.05
+    
+    MAX_STATS_HISTORY = 14400
+    # Every NIC keeps a short history; only interfaces someone is looking at get the long one
+    INTERFACE_STATS_HISTORY = 60
+    WATCHED_INTERFACE_STATS_HISTORY = 720
+    LATENCY_HISTORY_SIZE = 120
+    STATS_ROLLUP_TIERS = [(1, 3600), (60, 10080), (3600, 8760)]
+    STATS_QUERY_MAX_POINTS = 1500
     DEVICE_OFFLINE_TIMEOUT = 300
     
+    PERSISTENCE_ENABLED = True
+    DB_PATH = 'network_monitor.db'
+    PERSIST_FLUSH_INTERVAL = 2
+    PERSIST_BATCH_SIZE = 500
+    PERSIST_QUEUE_SIZE = 10000
+    PERSIST_RESTORE_WINDOW = 3600
+    PERSIST_RETENTION = 604800
+    
+    API_ENABLED = False
+    API_HOST = '127.0.0.1'
+    API_PORT = 8765
+    API_SSE_HEARTBEAT = 15
+    API_CACHE_SIZE = 256
+    
     DEFAULT_NETWORK_MASK = '255.255.255.0'
     SCAN_RANGE_START = 1
     SCAN_RANGE_END = 254
+    SCAN_NETWORKS = []
+    MIN_SCAN_PREFIX = 16
+    SCAN_CHUNK_SIZE = 1024
     
     WINDOW_WIDTH = 1200
     WINDOW_HEIGHT = 800
     PLOT_UPDATE_INTERVAL = 2000
+    PLOT_WINDOWS = {
+        'Live': None,
+        '1 hour': 3600,
+        '1 day': 86400,
+        '1 week': 604800
+    }
     
     COLORS = {
         'online': 'green',
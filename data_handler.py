@@ -1,121 +1,382 @@
 import time
 import threading
-from collections import deque
+from collections import namedtuple
+from types import MappingProxyType
+from config import Config
+from stats_buffer import StatsRingBuffer, InterfaceStatsBuffer
+from stats_rollup import RollupStore
+from device_table import DeviceTable
+from device import Device
+from latency_history import LatencyHistory
+import events
+
+DataSnapshot = namedtuple('DataSnapshot', [
+    'generation', 'device_generation', 'stats_generation',
+    'devices', 'devices_by_ip', 'devices_by_mac', 'online_devices',
+    'stats_state', 'latest_stats', 'interface_states', 'latest_interfaces'
+])
 
 class DataHandler:
-    def __init__(self):
-        self.devices = []
-        self.network_stats_history = deque(maxlen=300)
+    def __init__(self, store=None):
+        self.devices = DeviceTable()
+        self.network_stats_history = StatsRingBuffer(Config.MAX_STATS_HISTORY)
+        self.stats_rollups = RollupStore(StatsRingBuffer.RATE_FIELDS, Config.STATS_ROLLUP_TIERS)
+        self.interface_history = {}
+        self.watched_interfaces = set()
+        self.latency = {}
+        # Latency samples are not part of the snapshot, so they carry their own change counter
+        self.latency_generation = 0
+        # Only writers take the lock; readers use the last published snapshot
         self.lock = threading.Lock()
-        self.last_network_stats = None
+        self.store = store
+        self.events = events.EventBus()
+        self.published_device_version = None
+        self.snapshot = DataSnapshot(0, 0, 0, (), MappingProxyType({}), MappingProxyType({}), (), (0, 0), None,
+                                     MappingProxyType({}), MappingProxyType({}))
+        self._publish(stats_changed=True)
         
-    def update_devices(self, new_devices):
+        if self.store:
+            self._restore_devices()
+            threading.Thread(target=self._restore_stats_window, daemon=True).start()
+            
+    def _restore_devices(self):
+        try:
+            devices = self.store.load_devices()
+        except Exception as e:
+            print(f"Device restore failed: {e}")
+            return
+            
         with self.lock:
-            existing_devices = {device['ip']: device for device in self.devices}
+            for device in devices:
+                self.devices.upsert(Device.from_dict(dict(device, status='unknown')))
+            self._publish()
+        print(f"Restored {len(devices)} devices from {self.store.path}")
+        
+    def _restore_stats_window(self):
+        try:
+            samples = self.store.load_stats(time.time() - Config.PERSIST_RESTORE_WINDOW)
+        except Exception as e:
+            print(f"Stats restore failed: {e}")
+            return
+        if not samples:
+            return
+            
+        with self.lock:
+            # Replay the stored window ahead of anything collected since startup
+            live_samples = self.network_stats_history.to_dicts()
+            self.network_stats_history.clear()
+            self.stats_rollups.clear()
+            for stats in samples + [s for s in live_samples if s['timestamp'] > samples[-1]['timestamp']]:
+                row = self.network_stats_history.append(stats)
+                self.stats_rollups.add(stats['timestamp'], row[-len(StatsRingBuffer.RATE_FIELDS):])
+            self._publish(stats_changed=True)
+                
+    def _publish(self, stats_changed=False):
+        previous = self.snapshot
+        generation = previous.generation + 1
+        changes = {}
+        
+        if self.devices.version != self.published_device_version:
+            self.published_device_version = self.devices.version
+            changes.update(
+                device_generation=generation,
+                devices=self.devices.snapshot(),
+                devices_by_ip=MappingProxyType(dict(self.devices.by_ip)),
+                devices_by_mac=MappingProxyType(dict(self.devices.by_mac)),
+                online_devices=tuple(self.devices.with_status('online'))
+            )
+        if stats_changed:
+            changes.update(
+                stats_generation=generation,
+                stats_state=self.network_stats_history.state(),
+                latest_stats=self.network_stats_history.latest(),
+                # Buffers travel with their state so readers never pair a state with a re-created buffer
+                interface_states=MappingProxyType({name: (buffer, buffer.state())
+                                                   for name, buffer in self.interface_history.items()}),
+                latest_interfaces=MappingProxyType({name: buffer.latest()
+                                                    for name, buffer in self.interface_history.items()})
+            )
+            
+        if changes:
+            self.snapshot = previous._replace(generation=generation, **changes)
+            
+    def subscribe(self, types=None, max_size=None):
+        return self.events.subscribe(types, max_size)
+        
+    def get_snapshot(self):
+        return self.snapshot
+        
+    def get_generation(self):
+        return self.snapshot.generation
+        
+    def changed_since(self, generation, scope=None):
+        snapshot = self.snapshot
+        if scope == 'devices':
+            return snapshot.device_generation > generation
+        if scope == 'stats':
+            return snapshot.stats_generation > generation
+        return snapshot.generation > generation
+                
+    def _persist_devices(self, devices):
+        if self.store:
+            self.store.record_devices(devices)
+            
+    def _persist_removals(self, changes):
+        # Expired devices leave the database too, or every restart would bring them back as unknown
+        removed = [ip for event_type, ip, _ in changes if event_type == events.DEVICE_REMOVED]
+        if self.store and removed:
+            self.store.forget_devices(removed)
+        
+    def _device_event(self, previous, current):
+        if previous is None:
+            return events.DEVICE_ADDED
+        if current is None:
+            return events.DEVICE_REMOVED
+        if previous.status != current.status:
+            return events.DEVICE_ONLINE if current.status == 'online' else events.DEVICE_OFFLINE
+        if previous.ping_time is not None and current.ping_time is not None:
+            threshold = max(Config.RTT_CHANGE_THRESHOLD_MS, previous.ping_time * Config.RTT_CHANGE_RATIO)
+            if abs(current.ping_time - previous.ping_time) > threshold:
+                return events.RTT_CHANGED
+        # Routine last_seen/ping_time refreshes are not worth an event
+        for name in ('hostname', 'scan_method', 'extra_info', 'mac'):
+            if getattr(previous, name) != getattr(current, name):
+                return events.DEVICE_UPDATED
+        return None
+        
+    def _track(self, changes, ip, previous):
+        current = self.devices.get(ip)
+        if current is previous:
+            return
+        event_type = self._device_event(previous, current)
+        if event_type is not None:
+            changes.append((event_type, ip, current if current is not None else previous))
             
-            updated_devices = []
+    def _upsert(self, device, changes):
+        previous = self.devices.get(device.ip)
+        self.devices.upsert(device)
+        self._track(changes, device.ip, previous)
+        
+    def _remove(self, ip, changes):
+        if self.latency.pop(ip, None) is not None:
+            self.latency_generation += 1
+        previous = self.devices.remove(ip)
+        if previous is not None:
+            changes.append((events.DEVICE_REMOVED, ip, previous))
+            
+    def _emit(self, changes):
+        generation = self.snapshot.generation
+        for event_type, key, data in changes:
+            self.events.publish(event_type, key, data, generation)
+            
+    def _expire_missing(self, ips, now, changes):
+        for ip in ips:
+            device = self.devices.get(ip)
+            if device is None:
+                continue
+            if now - device.last_seen < Config.DEVICE_OFFLINE_TIMEOUT:
+                self.devices.update(ip, status='offline')
+                self._track(changes, ip, device)
+            else:
+                self._remove(ip, changes)
+                
+    def update_devices(self, new_devices):
+        with self.lock:
+            changes = []
+            seen = set()
             for new_device in new_devices:
-                ip = new_device['ip']
-                if ip in existing_devices:
-                    existing_device = existing_devices[ip]
-                    existing_device.update(new_device)
-                    updated_devices.append(existing_device)
-                else:
-                    updated_devices.append(new_device)
-                    
-            for existing_device in self.devices:
-                if existing_device['ip'] not in [d['ip'] for d in new_devices]:
-                    time_since_seen = time.time() - existing_device['last_seen']
-                    if time_since_seen < 300:
-                        existing_device['status'] = 'offline'
-                        if existing_device not in updated_devices:
-                            updated_devices.append(existing_device)
-                            
-            self.devices = updated_devices
+                self._upsert(new_device, changes)
+                seen.add(new_device.ip)
+                
+            missing = [ip for ip in self.devices.ips() if ip not in seen]
+            self._expire_missing(missing, time.time(), changes)
+            self._persist_devices(self.devices.snapshot())
+            self._persist_removals(changes)
+            self._publish()
+            self._emit(changes)
+            
+    def apply_probe_results(self, found_devices, missed_ips):
+        with self.lock:
+            changes = []
+            for new_device in found_devices:
+                self._upsert(new_device, changes)
+                
+            self._expire_missing(missed_ips, time.time(), changes)
+            self._persist_devices([self.devices.get(device.ip) for device in found_devices])
+            self._persist_devices([self.devices.get(ip) for ip in missed_ips if ip in self.devices])
+            self._persist_removals(changes)
+            self._publish()
+            self._emit(changes)
+            
+    def update_hostnames(self, hostnames):
+        # A whole batch of resolved names costs one publish, not one per device
+        with self.lock:
+            changes = []
+            updated = []
+            for ip, hostname in hostnames.items():
+                previous = self.devices.get(ip)
+                device = self.devices.update(ip, hostname=hostname)
+                if device is not None:
+                    self._track(changes, ip, previous)
+                    updated.append(device)
+            if updated:
+                self._persist_devices(updated)
+                self._publish()
+                self._emit(changes)
             
     def update_device_list(self, devices):
         with self.lock:
-            self.devices = devices.copy()
+            changes = []
+            seen = set()
+            for device in devices:
+                self._upsert(device, changes)
+                seen.add(device.ip)
+            for ip in [ip for ip in self.devices.ips() if ip not in seen]:
+                self._remove(ip, changes)
+            self._persist_devices(devices)
+            self._persist_removals(changes)
+            self._publish()
+            self._emit(changes)
+            
+    def record_latency(self, ips, rtts, timestamp=None):
+        if timestamp is None:
+            timestamp = time.time()
+        with self.lock:
+            for ip in ips:
+                rtt = rtts.get(ip)
+                history = self.latency.get(ip)
+                if history is None:
+                    # Silent addresses from a sweep only get a history once they are a known device
+                    if rtt is None and ip not in self.devices:
+                        continue
+                    history = self.latency[ip] = LatencyHistory(Config.LATENCY_HISTORY_SIZE)
+                if history.record(timestamp, rtt):
+                    self.latency_generation += 1
+                
+    def get_latency_generation(self):
+        return self.latency_generation
+        
+    def get_latency_stats(self, ip):
+        # Histories are updated in place, so reads briefly take the writer lock like query_stats
+        with self.lock:
+            history = self.latency.get(ip)
+            return dict(history.summary()) if history is not None else None
+            
+    def get_latency_series(self, ip):
+        with self.lock:
+            history = self.latency.get(ip)
+            return history.series() if history is not None else None
             
     def get_devices(self):
+        return self.snapshot.devices
+            
+    def _append_interfaces(self, timestamp, interfaces):
+        for name in self.interface_history.keys() - interfaces.keys():
+            del self.interface_history[name]
+            self.watched_interfaces.discard(name)
+        for name, counters in interfaces.items():
+            buffer = self.interface_history.get(name)
+            if buffer is None:
+                buffer = self.interface_history[name] = InterfaceStatsBuffer(Config.INTERFACE_STATS_HISTORY)
+            buffer.append(dict(counters, timestamp=timestamp))
+            
+    def watch_interface(self, name):
+        if name in self.watched_interfaces:
+            return
         with self.lock:
-            return self.devices.copy()
+            buffer = self.interface_history.get(name)
+            if buffer is None or name in self.watched_interfaces:
+                return
+            self.watched_interfaces.add(name)
+            self.interface_history[name] = buffer.resized(Config.WATCHED_INTERFACE_STATS_HISTORY)
+            self._publish(stats_changed=True)
             
     def add_network_stats(self, stats):
+        interfaces = stats.pop('interfaces', None)
         with self.lock:
-            if self.last_network_stats:
-                time_delta = stats['timestamp'] - self.last_network_stats['timestamp']
-                if time_delta > 0:
-                    stats['bytes_sent_rate'] = (stats['bytes_sent'] - self.last_network_stats['bytes_sent']) / time_delta
-                    stats['bytes_recv_rate'] = (stats['bytes_recv'] - self.last_network_stats['bytes_recv']) / time_delta
-                    stats['packets_sent_rate'] = (stats['packets_sent'] - self.last_network_stats['packets_sent']) / time_delta
-                    stats['packets_recv_rate'] = (stats['packets_recv'] - self.last_network_stats['packets_recv']) / time_delta
-                else:
-                    stats['bytes_sent_rate'] = 0
-                    stats['bytes_recv_rate'] = 0
-                    stats['packets_sent_rate'] = 0
-                    stats['packets_recv_rate'] = 0
-            else:
-                stats['bytes_sent_rate'] = 0
-                stats['bytes_recv_rate'] = 0
-                stats['packets_sent_rate'] = 0
-                stats['packets_recv_rate'] = 0
-                
-            self.network_stats_history.append(stats)
-            self.last_network_stats = stats
+            if interfaces is not None:
+                self._append_interfaces(stats['timestamp'], interfaces)
+            row = self.network_stats_history.append(stats)
+            rates = row[-len(StatsRingBuffer.RATE_FIELDS):]
+            self.stats_rollups.add(stats['timestamp'], rates)
+            for name, rate in zip(StatsRingBuffer.RATE_FIELDS, rates):
+                stats[name] = float(rate)
+            if self.store:
+                self.store.record_stats(stats)
+            self._publish(stats_changed=True)
+            self._emit([(events.STATS_SAMPLE, None, self.snapshot.latest_stats)])
             
-    def get_stats_history(self, count=None):
-        with self.lock:
-            if count is None:
-                return list(self.network_stats_history)
-            else:
-                return list(self.network_stats_history)[-count:]
+    def get_stats_columns(self, count=None, fields=None):
+        return self.network_stats_history.columns(count, fields, self.snapshot.stats_state)
                 
-    def calculate_network_rates(self):
+    def get_interfaces(self):
+        return sorted(self.snapshot.interface_states)
+        
+    def get_interface_columns(self, name, count=None, fields=None):
+        entry = self.snapshot.interface_states.get(name)
+        if entry is None:
+            return None
+        buffer, state = entry
+        return buffer.columns(count, fields, state)
+        
+    def get_interface_stats(self):
+        return dict(self.snapshot.latest_interfaces)
+        
+    def query_stats(self, start, end=None, max_points=None):
+        if end is None:
+            end = time.time()
+        if max_points is None:
+            max_points = Config.STATS_QUERY_MAX_POINTS
+        # Rollup buckets are updated in place, so this rarer query still serializes with writers
         with self.lock:
-            if len(self.network_stats_history) < 2:
-                return {
-                    'bytes_sent_rate': 0,
-                    'bytes_recv_rate': 0,
-                    'packets_sent_rate': 0,
-                    'packets_recv_rate': 0
-                }
+            return self.stats_rollups.query(start, end, max_points)
                 
-            latest = self.network_stats_history[-1]
+    def calculate_network_rates(self):
+        snapshot = self.snapshot
+        latest = snapshot.latest_stats
+        if latest is None or snapshot.stats_state[1] < 2:
             return {
-                'bytes_sent_rate': latest.get('bytes_sent_rate', 0),
-                'bytes_recv_rate': latest.get('bytes_recv_rate', 0),
-                'packets_sent_rate': latest.get('packets_sent_rate', 0),
-                'packets_recv_rate': latest.get('packets_recv_rate', 0),
-                'total_bytes_sent': latest['bytes_sent'],
-                'total_bytes_recv': latest['bytes_recv'],
-                'total_packets_sent': latest['packets_sent'],
-                'total_packets_recv': latest['packets_recv']
+                'bytes_sent_rate': 0,
+                'bytes_recv_rate': 0,
+                'packets_sent_rate': 0,
+                'packets_recv_rate': 0
             }
             
+        return {
+            'bytes_sent_rate': latest['bytes_sent_rate'],
+            'bytes_recv_rate': latest['bytes_recv_rate'],
+            'packets_sent_rate': latest['packets_sent_rate'],
+            'packets_recv_rate': latest['packets_recv_rate'],
+            'total_bytes_sent': latest['bytes_sent'],
+            'total_bytes_recv': latest['bytes_recv'],
+            'total_packets_sent': latest['packets_sent'],
+            'total_packets_recv': latest['packets_recv']
+        }
+            
     def get_device_by_ip(self, ip):
-        with self.lock:
-            for device in self.devices:
-                if device['ip'] == ip:
-                    return device.copy()
-            return None
+        return self.snapshot.devices_by_ip.get(ip)
+            
+    def get_device_by_mac(self, mac):
+        snapshot = self.snapshot
+        ip = snapshot.devices_by_mac.get(mac)
+        return snapshot.devices_by_ip.get(ip) if ip is not None else None
             
     def get_online_devices(self):
-        with self.lock:
-            return [device.copy() for device in self.devices if device['status'] == 'online']
+        return list(self.snapshot.online_devices)
             
     def get_device_count(self):
-        with self.lock:
-            return len(self.devices)
+        return len(self.snapshot.devices)
             
     def get_online_device_count(self):
-        with self.lock:
-            return len([device for device in self.devices if device['status'] == 'online'])
+        return len(self.snapshot.online_devices)
             
     def clear_history(self):
         with self.lock:
             self.network_stats_history.clear()
-            self.last_network_stats = None
+            self.stats_rollups.clear()
+            self.interface_history.clear()
+            self.watched_interfaces.clear()
+            self._publish(stats_changed=True)
             
     def format_bytes(self, bytes_value):
         for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
@@ -125,13 +386,14 @@ class DataHandler:
         return f"{bytes_value:.1f} PB"
         
     def get_summary_stats(self):
-        with self.lock:
-            rates = self.calculate_network_rates()
-            return {
-                'total_devices': self.get_device_count(),
-                'online_devices': self.get_online_device_count(),
-                'bytes_sent_rate': self.format_bytes(rates['bytes_sent_rate']),
-                'bytes_recv_rate': self.format_bytes(rates['bytes_recv_rate']),
-                'total_bytes_sent': self.format_bytes(rates.get('total_bytes_sent', 0)),
-                'total_bytes_recv': self.format_bytes(rates.get('total_bytes_recv', 0))
-            }
\ No newline at end of file
+        snapshot = self.snapshot
+        rates = self.calculate_network_rates()
+        return {
+            'generation': snapshot.generation,
+            'total_devices': len(snapshot.devices),
+            'online_devices': len(snapshot.online_devices),
+            'bytes_sent_rate': self.format_bytes(rates['bytes_sent_rate']),
+            'bytes_recv_rate': self.format_bytes(rates['bytes_recv_rate']),
+            'total_bytes_sent': self.format_bytes(rates.get('total_bytes_sent', 0)),
+            'total_bytes_recv': self.format_bytes(rates.get('total_bytes_recv', 0))
+        }
\ No newline at end of file
@@ -0,0 +1,59 @@
+class Device:
+    __slots__ = ('ip', 'hostname', 'ping_time', 'status', 'last_seen', 'scan_method', 'extra_info', 'mac')
+    FIELDS = __slots__
+    # Fields a newer sighting only overrides when it actually carries a value, mapped to the placeholder it
+    # carries otherwise; a hostname restored from disk outlives the empty resolver cache after a restart
+    STICKY_FIELDS = {'mac': None, 'hostname': "Unknown"}
+    
+    def __init__(self, ip, hostname="Unknown", ping_time=None, status='unknown', last_seen=0.0,
+                 scan_method=None, extra_info=None, mac=None):
+        setter = object.__setattr__
+        setter(self, 'ip', ip)
+        setter(self, 'hostname', hostname)
+        setter(self, 'ping_time', ping_time)
+        setter(self, 'status', status)
+        setter(self, 'last_seen', last_seen)
+        setter(self, 'scan_method', scan_method)
+        setter(self, 'extra_info', extra_info)
+        setter(self, 'mac', mac)
+    
+    def __setattr__(self, name, value):
+        raise AttributeError("Device records are immutable, use replace()")
+    
+    def __delattr__(self, name):
+        raise AttributeError("Device records are immutable, use replace()")
+    
+    def __eq__(self, other):
+        if not isinstance(other, Device):
+            return NotImplemented
+        return self.as_tuple() == other.as_tuple()
+    
+    def __hash__(self):
+        return hash(self.as_tuple())
+    
+    def __repr__(self):
+        return f"Device(ip={self.ip!r}, hostname={self.hostname!r}, status={self.status!r})"
+    
+    def as_tuple(self):
+        return tuple(getattr(self, name) for name in self.FIELDS)
+    
+    def replace(self, **changes):
+        values = {name: getattr(self, name) for name in self.FIELDS}
+        values.update(changes)
+        return Device(**values)
+    
+    def merge(self, newer):
+        current = self.as_tuple()
+        values = newer.as_tuple()
+        if values == current:
+            return self
+        values = tuple(old if name in self.STICKY_FIELDS and new == self.STICKY_FIELDS[name] else new
+                       for name, old, new in zip(self.FIELDS, current, values))
+        return self if values == current else Device(*values)
+    
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.FIELDS}
+    
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{name: data[name] for name in cls.FIELDS if name in data})
\ No newline at end of file
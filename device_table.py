@@ -0,0 +1,98 @@
+from collections import defaultdict
+
+class DeviceTable:
+    def __init__(self):
+        self.by_ip = {}
+        self.by_status = defaultdict(set)
+        self.by_mac = {}
+        self.snapshot_cache = None
+        self.version = 0
+    
+    def __len__(self):
+        return len(self.by_ip)
+    
+    def __contains__(self, ip):
+        return ip in self.by_ip
+    
+    def _reindex(self, old, new):
+        self.snapshot_cache = None
+        self.version += 1
+        ip = new.ip if new is not None else old.ip
+        
+        old_status = old.status if old is not None else None
+        new_status = new.status if new is not None else None
+        if old_status != new_status:
+            if old is not None:
+                self.by_status[old_status].discard(ip)
+            if new is not None:
+                self.by_status[new_status].add(ip)
+        
+        old_mac = old.mac if old is not None else None
+        new_mac = new.mac if new is not None else None
+        if old_mac != new_mac:
+            if old_mac is not None and self.by_mac.get(old_mac) == ip:
+                del self.by_mac[old_mac]
+            if new_mac:
+                self.by_mac[new_mac] = ip
+    
+    def upsert(self, device):
+        existing = self.by_ip.get(device.ip)
+        
+        if existing is None:
+            self.by_ip[device.ip] = device
+            self._reindex(None, device)
+            return 'added'
+        
+        merged = existing.merge(device)
+        if merged is existing:
+            return None
+        self.by_ip[device.ip] = merged
+        self._reindex(existing, merged)
+        return 'status' if merged.status != existing.status else 'changed'
+    
+    def update(self, ip, **changes):
+        existing = self.by_ip.get(ip)
+        if existing is None:
+            return None
+        updated = existing.replace(**changes)
+        if updated != existing:
+            self.by_ip[ip] = updated
+            self._reindex(existing, updated)
+        return updated
+    
+    def remove(self, ip):
+        device = self.by_ip.pop(ip, None)
+        if device is not None:
+            self._reindex(device, None)
+        return device
+    
+    def get(self, ip):
+        return self.by_ip.get(ip)
+    
+    def get_by_mac(self, mac):
+        ip = self.by_mac.get(mac)
+        return self.by_ip.get(ip) if ip is not None else None
+    
+    def ips(self):
+        return self.by_ip.keys()
+    
+    def snapshot(self):
+        # Records are immutable, so readers can share one tuple until the next write
+        if self.snapshot_cache is None:
+            self.snapshot_cache = tuple(self.by_ip.values())
+        return self.snapshot_cache
+    
+    def with_status(self, status):
+        return [self.by_ip[ip] for ip in self.by_status.get(status, ())]
+    
+    def count(self, status=None):
+        if status is None:
+            return len(self.by_ip)
+        return len(self.by_status.get(status, ()))
+    
+    def clear(self):
+        self.by_ip.clear()
+        self.by_status.clear()
+        self.by_mac.clear()
+        self.snapshot_cache = None
+        self.version += 1
\ No newline at end of file
@@ -0,0 +1,197 @@
+import socket
+from tkinter import ttk
+
+class VirtualDeviceView:
+    COLUMNS = ('IP', 'Hostname', 'MAC', 'Status', 'Ping (ms)', 'Method', 'Last Seen')
+    COLUMN_WIDTHS = {'IP': 120, 'Hostname': 150, 'MAC': 130, 'Status': 80, 'Ping (ms)': 80, 'Method': 100, 'Last Seen': 120}
+    EMPTY_ROW = (('',) * len(COLUMNS), ())
+    
+    def __init__(self, parent, row_formatter):
+        self.row_formatter = row_formatter
+        self.frame = ttk.Frame(parent)
+        
+        self.tree = ttk.Treeview(self.frame, columns=self.COLUMNS, show='headings', selectmode='browse')
+        for col in self.COLUMNS:
+            self.tree.heading(col, text=col, command=lambda c=col: self.sort_by(c))
+            self.tree.column(col, width=self.COLUMN_WIDTHS.get(col, 100))
+        self.tree.tag_configure('online', foreground='green')
+        self.tree.tag_configure('offline', foreground='red')
+        
+        self.scrollbar = ttk.Scrollbar(self.frame, orient='vertical', command=self._on_scrollbar)
+        self.tree.pack(side='left', fill='both', expand=True)
+        self.scrollbar.pack(side='right', fill='y')
+        
+        self.tree.bind('<Configure>', lambda event: self.render())
+        self.tree.bind('<MouseWheel>', self._on_mousewheel)
+        self.tree.bind('<Button-4>', lambda event: self.scroll(-3))
+        self.tree.bind('<Button-5>', lambda event: self.scroll(3))
+        self.tree.bind('<<TreeviewSelect>>', self._on_select)
+        
+        try:
+            self.row_height = int(ttk.Style().lookup('Treeview', 'rowheight') or 20)
+        except (ValueError, TypeError):
+            self.row_height = 20
+        
+        self.slots = []
+        self.slot_rows = []
+        self.offset = 0
+        
+        self.snapshot = None
+        self.order = []
+        self.order_key = None
+        self.sort_column = 'IP'
+        self.sort_reverse = False
+        self.status_filter = None
+        self.text_filter = ''
+        self.selected_ip = None
+        
+        # Sort keys and lowercase hostnames are cached per record, so re-sorting only recomputes what changed
+        self.key_cache = {}
+    
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+    
+    def _keys(self, device):
+        cached = self.key_cache.get(device.ip)
+        if cached is not None and cached[0] is device:
+            return cached[1]
+        keys = {
+            'IP': socket.inet_aton(device.ip),
+            'Hostname': device.hostname.lower(),
+            'MAC': device.mac or '',
+            'Status': device.status,
+            'Ping (ms)': device.ping_time if device.ping_time is not None else float('inf'),
+            'Method': device.scan_method or '',
+            'Last Seen': device.last_seen
+        }
+        self.key_cache[device.ip] = (device, keys)
+        return keys
+    
+    def _rebuild_order(self):
+        if self.snapshot is None:
+            return
+        order_key = (self.snapshot.device_generation, self.sort_column, self.sort_reverse,
+                     self.status_filter, self.text_filter)
+        if order_key == self.order_key:
+            return
+        self.order_key = order_key
+        
+        if self.status_filter == 'online':
+            devices = self.snapshot.online_devices
+        elif self.status_filter is not None:
+            devices = [d for d in self.snapshot.devices if d.status == self.status_filter]
+        else:
+            devices = self.snapshot.devices
+        
+        entries = [(self._keys(device), device.ip) for device in devices]
+        if self.text_filter:
+            needle = self.text_filter.lower()
+            entries = [entry for entry in entries if needle in entry[0]['Hostname']]
+        
+        entries.sort(key=lambda entry: entry[0][self.sort_column], reverse=self.sort_reverse)
+        self.order = [ip for _, ip in entries]
+        
+        if len(self.key_cache) > 2 * len(self.snapshot.devices) + 1024:
+            self.key_cache = {ip: value for ip, value in self.key_cache.items()
+                              if ip in self.snapshot.devices_by_ip}
+    
+    def set_snapshot(self, snapshot):
+        self.snapshot = snapshot
+        self._rebuild_order()
+        self.render()
+    
+    def set_filter(self, status=None, text=''):
+        self.status_filter = status
+        self.text_filter = text.strip()
+        self.offset = 0
+        self._rebuild_order()
+        self.render()
+    
+    def sort_by(self, column):
+        if column == self.sort_column:
+            self.sort_reverse = not self.sort_reverse
+        else:
+            self.sort_column = column
+            self.sort_reverse = False
+        for col in self.COLUMNS:
+            arrow = (' ▼' if self.sort_reverse else ' ▲') if col == column else ''
+            self.tree.heading(col, text=col + arrow)
+        self._rebuild_order()
+        self.render()
+    
+    def _visible_count(self):
+        height = self.tree.winfo_height()
+        if height <= 1:
+            return 20
+        # One row's worth of height is taken by the headings
+        return max(1, height // self.row_height - 1)
+    
+    def _ensure_slots(self, count):
+        while len(self.slots) < count:
+            self.slots.append(self.tree.insert('', 'end', values=self.EMPTY_ROW[0]))
+            self.slot_rows.append(self.EMPTY_ROW)
+        while len(self.slots) > count:
+            self.tree.delete(self.slots.pop())
+            self.slot_rows.pop()
+    
+    def render(self):
+        count = self._visible_count()
+        self._ensure_slots(count)
+        self.offset = max(0, min(self.offset, len(self.order) - count))
+        devices_by_ip = self.snapshot.devices_by_ip if self.snapshot is not None else {}
+        
+        selected_item = None
+        for i, item in enumerate(self.slots):
+            index = self.offset + i
+            row = self.EMPTY_ROW
+            if index < len(self.order):
+                ip = self.order[index]
+                device = devices_by_ip.get(ip)
+                if device is not None:
+                    row = self.row_formatter(device)
+                if ip == self.selected_ip:
+                    selected_item = item
+            if self.slot_rows[i] != row:
+                values, tags = row
+                self.tree.item(item, values=values, tags=tags)
+                self.slot_rows[i] = row
+        
+        current = self.tree.selection()
+        if selected_item is not None:
+            if current != (selected_item,):
+                self.tree.selection_set(selected_item)
+        elif current:
+            self.tree.selection_remove(*current)
+        
+        total = len(self.order)
+        if total:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + count) / total))
+        else:
+            self.scrollbar.set(0, 1)
+    
+    def scroll(self, rows):
+        self.offset += rows
+        self.render()
+    
+    def _on_scrollbar(self, action, value, unit=None):
+        count = len(self.slots) or 1
+        if action == 'moveto':
+            self.offset = int(float(value) * len(self.order))
+        elif action == 'scroll':
+            step = count if unit == 'pages' else 1
+            self.offset += int(value) * step
+        self.render()
+    
+    def _on_mousewheel(self, event):
+        self.scroll(-3 if event.delta > 0 else 3)
+    
+    def _on_select(self, event=None):
+        selection = self.tree.selection()
+        if not selection or selection[0] not in self.slots:
+            return
+        index = self.offset + self.slots.index(selection[0])
+        if index < len(self.order):
+            self.selected_ip = self.order[index]
+    
+    def get_selected_ip(self):
+        return self.selected_ip
\ No newline at end of file
@@ -0,0 +1,94 @@
+import threading
+import time
+from collections import namedtuple, OrderedDict
+from config import Config
+
+DEVICE_ADDED = 'device_added'
+DEVICE_REMOVED = 'device_removed'
+DEVICE_OFFLINE = 'device_offline'
+DEVICE_ONLINE = 'device_online'
+DEVICE_UPDATED = 'device_updated'
+RTT_CHANGED = 'rtt_changed'
+STATS_SAMPLE = 'stats_sample'
+
+DEVICE_EVENTS = (DEVICE_ADDED, DEVICE_REMOVED, DEVICE_OFFLINE, DEVICE_ONLINE, DEVICE_UPDATED, RTT_CHANGED)
+ALL_EVENTS = DEVICE_EVENTS + (STATS_SAMPLE,)
+
+Event = namedtuple('Event', ['type', 'key', 'data', 'generation', 'timestamp'])
+
+class Subscription:
+    def __init__(self, bus, types, max_size):
+        self.bus = bus
+        self.types = frozenset(types)
+        self.max_size = max_size
+        # Keyed by (type, key): a newer event replaces a pending one and moves to the back
+        self.pending = OrderedDict()
+        self.condition = threading.Condition()
+        self.closed = False
+        self.coalesced = 0
+        self.dropped = 0
+    
+    def _offer(self, event):
+        with self.condition:
+            if self.closed:
+                return
+            coalesce_key = (event.type, event.key)
+            if coalesce_key in self.pending:
+                self.coalesced += 1
+                self.pending.move_to_end(coalesce_key)
+            elif len(self.pending) >= self.max_size:
+                self.pending.popitem(last=False)
+                self.dropped += 1
+            self.pending[coalesce_key] = event
+            self.condition.notify()
+    
+    def get(self, timeout=None):
+        with self.condition:
+            if not self.pending and not self.closed:
+                self.condition.wait(timeout)
+            if not self.pending:
+                return None
+            return self.pending.popitem(last=False)[1]
+    
+    def drain(self, max_items=None):
+        with self.condition:
+            events = []
+            while self.pending and (max_items is None or len(events) < max_items):
+                events.append(self.pending.popitem(last=False)[1])
+            return events
+    
+    def __len__(self):
+        return len(self.pending)
+    
+    def close(self):
+        self.bus.unsubscribe(self)
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+class EventBus:
+    def __init__(self):
+        self.subscriptions = ()
+        self.lock = threading.Lock()
+    
+    def subscribe(self, types=None, max_size=None):
+        subscription = Subscription(self, types or ALL_EVENTS, max_size or Config.EVENT_QUEUE_SIZE)
+        with self.lock:
+            self.subscriptions = self.subscriptions + (subscription,)
+        return subscription
+    
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscriptions = tuple(s for s in self.subscriptions if s is not subscription)
+    
+    def has_subscribers(self):
+        return bool(self.subscriptions)
+    
+    def publish(self, event_type, key, data, generation):
+        subscriptions = self.subscriptions
+        if not subscriptions:
+            return
+        event = Event(event_type, key, data, generation, time.time())
+        for subscription in subscriptions:
+            if event_type in subscription.types:
+                subscription._offer(event)
\ No newline at end of file
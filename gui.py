@@ -2,11 +2,17 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.animation import FuncAnimation
+from matplotlib.figure import Figure
 import threading
+import numpy as np
 import time
+from config import Config
+from device_view import VirtualDeviceView
+import events
 
 class NetworkMonitorGUI:
+    ALL_INTERFACES = 'All interfaces'
+    
     def __init__(self, data_handler, network_monitor, app):
         self.data_handler = data_handler
         self.network_monitor = network_monitor
@@ -18,8 +24,14 @@ class NetworkMonitorGUI:
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         
         self.monitoring_active = False
+        self.devices_generation = -1
+        self.plot_key = None
+        self.plot_limits = None
+        self.plot_background = None
+        self.device_events = self.data_handler.subscribe(events.DEVICE_EVENTS)
         self.setup_gui()
         self.start_auto_refresh()
+        self.start_event_pump()
         
     def setup_gui(self):
         self.notebook = ttk.Notebook(self.root)
@@ -61,6 +73,14 @@ class NetworkMonitorGUI:
                                        command=self.refresh_devices)
         self.refresh_button.pack(side='left', padx=5)
         
+        self.latency_button = ttk.Button(control_frame, text="Latency",
+                                       command=self.show_latency)
+        self.latency_button.pack(side='left', padx=5)
+        
+        self.ports_button = ttk.Button(control_frame, text="Ports",
+                                     command=self.show_ports)
+        self.ports_button.pack(side='left', padx=5)
+        
         method_info = self.network_monitor.get_scan_method_info()
         
         ttk.Label(control_frame, text="Method:").pack(side='left', padx=(20,5))
@@ -71,27 +91,50 @@ class NetworkMonitorGUI:
         method_combo.pack(side='left', padx=5)
         method_combo.bind('<<ComboboxSelected>>', self.on_scan_method_change)
         
-        columns = ('IP', 'Hostname', 'Status', 'Ping (ms)', 'Method', 'Last Seen')
-        self.devices_tree = ttk.Treeview(self.devices_frame, columns=columns, show='headings')
+        filter_frame = ttk.Frame(self.devices_frame)
+        filter_frame.pack(fill='x', padx=5)
         
-        column_widths = {'IP': 120, 'Hostname': 150, 'Status': 80, 'Ping (ms)': 80, 'Method': 100, 'Last Seen': 120}
-        for col in columns:
-            self.devices_tree.heading(col, text=col)
-            self.devices_tree.column(col, width=column_widths.get(col, 100))
-            
-        devices_scrollbar = ttk.Scrollbar(self.devices_frame, orient='vertical', 
-                                        command=self.devices_tree.yview)
-        self.devices_tree.configure(yscrollcommand=devices_scrollbar.set)
+        ttk.Label(filter_frame, text="Status:").pack(side='left', padx=5)
+        self.status_filter_var = tk.StringVar(value='All')
+        status_combo = ttk.Combobox(filter_frame, textvariable=self.status_filter_var,
+                                  values=['All', 'Online', 'Offline', 'Unknown'],
+                                  state='readonly', width=10)
+        status_combo.pack(side='left', padx=5)
+        status_combo.bind('<<ComboboxSelected>>', self.on_device_filter_change)
         
-        devices_frame_container = ttk.Frame(self.devices_frame)
-        devices_frame_container.pack(fill='both', expand=True, padx=5, pady=5)
+        ttk.Label(filter_frame, text="Hostname:").pack(side='left', padx=(20,5))
+        self.hostname_filter_var = tk.StringVar()
+        ttk.Entry(filter_frame, textvariable=self.hostname_filter_var, width=25).pack(side='left', padx=5)
+        self.hostname_filter_var.trace_add('write', self.on_device_filter_change)
         
-        self.devices_tree.pack(side='left', fill='both', expand=True)
-        devices_scrollbar.pack(side='right', fill='y')
+        self.device_view = VirtualDeviceView(self.devices_frame, self._device_row)
+        self.device_view.pack(fill='both', expand=True, padx=5, pady=5)
+        self.device_view.tree.bind('<Double-1>', lambda event: self.show_latency())
         
     def setup_stats_tab(self):
+        stats_control_frame = ttk.Frame(self.stats_frame)
+        stats_control_frame.pack(fill='x', padx=5, pady=5)
+        
+        ttk.Label(stats_control_frame, text="Window:").pack(side='left', padx=5)
+        self.plot_window_var = tk.StringVar(value='Live')
+        window_combo = ttk.Combobox(stats_control_frame, textvariable=self.plot_window_var,
+                                  values=list(Config.PLOT_WINDOWS.keys()),
+                                  state='readonly', width=10)
+        window_combo.pack(side='left', padx=5)
+        window_combo.bind('<<ComboboxSelected>>', lambda event: self.update_plots())
+        
+        ttk.Label(stats_control_frame, text="Interface:").pack(side='left', padx=(20,5))
+        self.plot_interface_var = tk.StringVar(value=self.ALL_INTERFACES)
+        self.interface_combo = ttk.Combobox(stats_control_frame, textvariable=self.plot_interface_var,
+                                          values=[self.ALL_INTERFACES], state='readonly', width=20)
+        self.interface_combo.pack(side='left', padx=5)
+        self.interface_combo.bind('<<ComboboxSelected>>', self.on_plot_interface_change)
+        self.interface_combo.bind('<Button-1>', self.refresh_interface_choices)
+        
+        self.interface_errors_label = ttk.Label(stats_control_frame, text="")
+        self.interface_errors_label.pack(side='left', padx=10)
+        
         self.fig, (self.ax1, self.ax2) = plt.subplots(2, 1, figsize=(10, 8))
-        self.fig.tight_layout(pad=3.0)
         
         self.ax1.set_title('Network Bandwidth (Bytes/sec)')
         self.ax1.set_ylabel('Bytes/sec')
@@ -102,10 +145,20 @@ class NetworkMonitorGUI:
         self.ax2.set_xlabel('Time (seconds ago)')
         self.ax2.grid(True, alpha=0.3)
         
+        # Lines are created once and marked animated, so they are left out of full redraws and blitted on top
+        self.plot_lines = {}
+        for ax, prefix in ((self.ax1, 'bytes'), (self.ax2, 'packets')):
+            for direction, label, color in (('sent', 'Sent', 'red'), ('recv', 'Received', 'blue')):
+                line, = ax.plot([], [], label=label, color=color, linewidth=2, animated=True)
+                self.plot_lines[f'{prefix}_{direction}_rate'] = line
+            ax.legend(loc='upper left')
+        self.fig.tight_layout(pad=3.0)
+        
         self.canvas = FigureCanvasTkAgg(self.fig, self.stats_frame)
         self.canvas.get_tk_widget().pack(fill='both', expand=True)
+        self.canvas.mpl_connect('draw_event', self._on_plot_draw)
         
-        self.anim = FuncAnimation(self.fig, self.update_plots, interval=2000, blit=False, cache_frame_data=False)
+        self.start_plot_updates()
         
     def setup_interfaces_tab(self):
         int_columns = ('Interface', 'IP Address', 'Netmask', 'Broadcast')
@@ -171,41 +224,166 @@ class NetworkMonitorGUI:
         try:
             self.network_monitor.scan_network()
             self.root.after(0, lambda: self.update_status("Scan completed"))
-            self.root.after(0, self.refresh_devices)
         except Exception as e:
             self.root.after(0, lambda: self.update_status(f"Scan failed: {e}"))
         finally:
             self.root.after(0, lambda: self.scan_button.config(state='normal'))
             
+    def _device_row(self, device):
+        last_seen = time.strftime('%H:%M:%S', time.localtime(device.last_seen))
+        ping_str = f"{device.ping_time:.1f}" if device.ping_time else "N/A"
+        
+        method_info = device.scan_method or 'unknown'
+        if device.extra_info:
+            method_info += f" ({device.extra_info})"
+        
+        tags = ('online',) if device.status == 'online' else ('offline',)
+        
+        return (
+            device.ip,
+            device.hostname,
+            device.mac or '',
+            device.status.title(),
+            ping_str,
+            method_info,
+            last_seen
+        ), tags
+        
+    def on_device_filter_change(self, *args):
+        status = self.status_filter_var.get()
+        self.device_view.set_filter(None if status == 'All' else status.lower(),
+                                    self.hostname_filter_var.get())
+        
     def refresh_devices(self):
-        for item in self.devices_tree.get_children():
-            self.devices_tree.delete(item)
+        # Only the rows currently scrolled into view are rebuilt, whatever the size of the store
+        snapshot = self.data_handler.get_snapshot()
+        self.devices_generation = snapshot.device_generation
+        self.device_view.set_snapshot(snapshot)
+        
+        online_count = len(snapshot.online_devices)
+        shown = len(self.device_view.order)
+        label = f"Devices: {len(snapshot.devices)} ({online_count} online)"
+        if shown != len(snapshot.devices):
+            label += f", {shown} shown"
+        self.device_count_label.config(text=label)
+        
+    def show_latency(self):
+        ip = self.device_view.get_selected_ip()
+        if ip is None:
+            self.update_status("Select a device to show its latency")
+            return
             
-        devices = self.data_handler.get_devices()
-        for device in devices:
-            last_seen = time.strftime('%H:%M:%S', time.localtime(device['last_seen']))
-            ping_str = f"{device['ping_time']:.1f}" if device['ping_time'] else "N/A"
+        window = tk.Toplevel(self.root)
+        window.title(f"Latency - {ip}")
+        window.geometry("700x450")
+        
+        summary_label = ttk.Label(window, text="", justify='left')
+        summary_label.pack(fill='x', padx=10, pady=5)
+        
+        # A plain Figure rather than pyplot, so closed windows don't leave figures registered
+        fig = Figure(figsize=(7, 3.5))
+        ax = fig.add_subplot(111)
+        canvas = FigureCanvasTkAgg(fig, window)
+        canvas.get_tk_widget().pack(fill='both', expand=True)
+        
+        def draw():
+            summary = self.data_handler.get_latency_stats(ip)
+            series = self.data_handler.get_latency_series(ip)
+            ax.clear()
+            ax.set_title(f'Round-trip time for {ip}')
+            ax.set_ylabel('RTT (ms)')
+            ax.set_xlabel('Time (minutes ago)')
+            ax.grid(True, alpha=0.3)
             
-            method_info = device.get('scan_method', 'unknown')
-            if device.get('extra_info'):
-                method_info += f" ({device['extra_info']})"
+            if summary is None or series is None or not len(series[0]):
+                summary_label.config(text="No latency samples recorded for this device yet")
+                canvas.draw_idle()
+                return
+                
+            times, rtts = series
+            minutes = (times - time.time()) / 60
+            lost = np.isnan(rtts)
+            ax.plot(minutes, rtts, color='blue', linewidth=1.5, marker='.', label='RTT')
+            if lost.any():
+                ax.plot(minutes[lost], np.zeros(lost.sum()), 'rx', label='Lost')
+            ax.legend(loc='upper left')
+            canvas.draw_idle()
             
-            tags = ('online',) if device['status'] == 'online' else ('offline',)
+            def ms(value):
+                return f"{value:.1f}" if value is not None else "N/A"
+            summary_label.config(text=(
+                f"p50 {ms(summary['p50_ms'])} ms   p95 {ms(summary['p95_ms'])} ms   "
+                f"p99 {ms(summary['p99_ms'])} ms   jitter {summary['jitter_ms']:.1f} ms\n"
+                f"Loss {summary['loss_rate'] * 100:.1f}% of last {summary['samples']} probes "
+                f"({summary['lost']} of {summary['sent']} overall)"))
             
-            self.devices_tree.insert('', 'end', values=(
-                device['ip'],
-                device['hostname'],
-                device['status'].title(),
-                ping_str,
-                method_info,
-                last_seen
-            ), tags=tags)
+        ttk.Button(window, text="Refresh", command=draw).pack(pady=5)
+        draw()
+        
+    def show_ports(self):
+        ip = self.device_view.get_selected_ip()
+        if ip is None:
+            self.update_status("Select a device to show its open ports")
+            return
             
-        self.devices_tree.tag_configure('online', foreground='green')
-        self.devices_tree.tag_configure('offline', foreground='red')
-        
-        online_count = len([d for d in devices if d['status'] == 'online'])
-        self.device_count_label.config(text=f"Devices: {len(devices)} ({online_count} online)")
+        window = tk.Toplevel(self.root)
+        window.title(f"Ports - {ip}")
+        window.geometry("700x400")
+        
+        control_frame = ttk.Frame(window)
+        control_frame.pack(fill='x', padx=10, pady=5)
+        ttk.Label(control_frame, text="Ports:").pack(side='left')
+        ports_var = tk.StringVar(value=Config.PORT_SCAN_PORTS or ','.join(map(str, sorted(Config.PORT_SERVICES))))
+        ttk.Entry(control_frame, textvariable=ports_var, width=40).pack(side='left', padx=5)
+        banners_var = tk.BooleanVar(value=Config.PORT_SCAN_BANNERS)
+        ttk.Checkbutton(control_frame, text="Grab banners", variable=banners_var).pack(side='left', padx=5)
+        scan_button = ttk.Button(control_frame, text="Scan")
+        scan_button.pack(side='left', padx=5)
+        
+        summary_label = ttk.Label(window, text="")
+        summary_label.pack(fill='x', padx=10)
+        
+        columns = ('Port', 'Service', 'Banner', 'RTT (ms)')
+        tree = ttk.Treeview(window, columns=columns, show='headings')
+        for col, width in zip(columns, (60, 100, 420, 70)):
+            tree.heading(col, text=col)
+            tree.column(col, width=width)
+        tree.pack(fill='both', expand=True, padx=10, pady=5)
+        
+        def show(inventory):
+            if not window.winfo_exists():
+                return
+            tree.delete(*tree.get_children())
+            for entry in inventory['open']:
+                service = entry['service'] if entry['confirmed'] else f"{entry['service']}?"
+                tree.insert('', 'end', values=(entry['port'], service, entry['banner'] or '', f"{entry['rtt_ms']:.1f}"))
+            scanned = time.strftime('%H:%M:%S', time.localtime(inventory['scanned_at']))
+            summary_label.config(text=(
+                f"{len(inventory['open'])} open, {inventory['closed']} closed, {inventory['filtered']} filtered "
+                f"of {inventory['ports_scanned']} ports (scanned {scanned} in {inventory['duration']:.1f}s)"))
+            
+        def scan(refresh):
+            scan_button.config(state='disabled')
+            summary_label.config(text="Scanning...")
+            ports, banners = ports_var.get(), banners_var.get()
+            
+            def run():
+                try:
+                    inventory = self.network_monitor.scan_ports([ip], ports, banners, refresh)[ip]
+                    self.root.after(0, lambda: show(inventory))
+                except ValueError as e:
+                    msg = f"Invalid ports: {e}"
+                    self.root.after(0, lambda msg=msg: summary_label.config(text=msg))
+                finally:
+                    self.root.after(0, lambda: window.winfo_exists() and scan_button.config(state='normal'))
+            threading.Thread(target=run, daemon=True).start()
+            
+        scan_button.config(command=lambda: scan(True))
+        inventory = self.network_monitor.get_port_inventory(ip)
+        if inventory is not None:
+            show(inventory)
+        else:
+            scan(False)
         
     def refresh_interfaces(self):
         for item in self.interfaces_tree.get_children():
@@ -221,51 +399,151 @@ class NetworkMonitorGUI:
                     addr.get('broadcast', 'N/A')
                 ))
                 
-    def update_plots(self, frame):
-        try:
-            rates = self.data_handler.calculate_network_rates()
-            history = self.data_handler.get_stats_history(60)
+    def _time_axis(self, window):
+        if window is None:
+            return 'Time (seconds ago)', 1
+        return ('Time (hours ago)', 3600) if window > 3600 else ('Time (minutes ago)', 60)
+        
+    def _interface_plot_data(self, interface, window):
+        # Per-interface history is raw samples only, limited to WATCHED_INTERFACE_STATS_HISTORY
+        history = self.data_handler.get_interface_columns(interface, 60 if window is None else None)
+        if history is None or not len(history['timestamp']):
+            return None
+            
+        latest = self.data_handler.get_interface_stats().get(interface) or {}
+        self.interface_errors_label.config(
+            text=f"Errors in/out: {latest.get('errin', 0):.0f}/{latest.get('errout', 0):.0f}   "
+                 f"Drops in/out: {latest.get('dropin', 0):.0f}/{latest.get('dropout', 0):.0f}")
+            
+        time_label, time_scale = self._time_axis(window)
+        if window is None:
+            times = history['timestamp'] - history['timestamp'][-1]
+            series = {field: history[field] for field in self.plot_lines}
+            return times, series, time_label, -59 * Config.STATS_UPDATE_INTERVAL
             
-            if not history:
+        now = time.time()
+        keep = history['timestamp'] >= now - window
+        times = (history['timestamp'][keep] - now) / time_scale
+        series = {field: history[field][keep] for field in self.plot_lines}
+        return times, series, time_label, -window / time_scale
+        
+    def on_plot_interface_change(self, event=None):
+        interface = self.plot_interface_var.get()
+        if interface == self.ALL_INTERFACES:
+            self.interface_errors_label.config(text="")
+        else:
+            self.data_handler.watch_interface(interface)
+        self.update_plots()
+        
+    def refresh_interface_choices(self, event=None):
+        self.interface_combo.config(values=[self.ALL_INTERFACES] + self.data_handler.get_interfaces())
+        
+    def _on_plot_draw(self, event):
+        # A full draw (limits, resize) leaves the static parts on screen; keep them as the blit background
+        self.plot_background = self.canvas.copy_from_bbox(self.fig.bbox)
+        for line in self.plot_lines.values():
+            line.axes.draw_artist(line)
+            
+    def _plot_ylimit(self, ax, values):
+        peak = max((float(v.max()) for v in values if len(v)), default=0.0)
+        top = ax.get_ylim()[1]
+        # Only rescale when the data leaves the current range or shrinks well inside it
+        if peak > top or peak < top * 0.25:
+            top = max(peak * 1.2, 1.0)
+        return top
+        
+    def update_plots(self):
+        try:
+            if self.notebook.select() != str(self.stats_frame):
                 return
                 
-            times = [-(len(history) - i - 1) * 5 for i in range(len(history))]
-            bytes_sent = [stats.get('bytes_sent_rate', 0) for stats in history]
-            bytes_recv = [stats.get('bytes_recv_rate', 0) for stats in history]
-            packets_sent = [stats.get('packets_sent_rate', 0) for stats in history]
-            packets_recv = [stats.get('packets_recv_rate', 0) for stats in history]
-            
-            self.ax1.clear()
-            self.ax1.plot(times, bytes_sent, label='Sent', color='red', linewidth=2)
-            self.ax1.plot(times, bytes_recv, label='Received', color='blue', linewidth=2)
-            self.ax1.set_title('Network Bandwidth (Bytes/sec)')
-            self.ax1.set_ylabel('Bytes/sec')
-            self.ax1.legend()
-            self.ax1.grid(True, alpha=0.3)
+            window_name = self.plot_window_var.get()
+            interface = self.plot_interface_var.get()
+            stats_generation = self.data_handler.get_snapshot().stats_generation
+            plot_key = (stats_generation, window_name, interface)
+            if plot_key == self.plot_key and self.plot_background is not None:
+                return
+                
+            window = Config.PLOT_WINDOWS.get(window_name)
             
-            self.ax2.clear()
-            self.ax2.plot(times, packets_sent, label='Sent', color='red', linewidth=2)
-            self.ax2.plot(times, packets_recv, label='Received', color='blue', linewidth=2)
-            self.ax2.set_title('Network Packets (Packets/sec)')
-            self.ax2.set_ylabel('Packets/sec')
-            self.ax2.set_xlabel('Time (seconds ago)')
-            self.ax2.legend()
-            self.ax2.grid(True, alpha=0.3)
+            if interface != self.ALL_INTERFACES:
+                plot_data = self._interface_plot_data(interface, window)
+                if plot_data is None:
+                    return
+                times, series, time_label, xmin = plot_data
+            elif window is None:
+                history = self.data_handler.get_stats_columns(60)
+                if not len(history['timestamp']):
+                    return
+                    
+                times = history['timestamp'] - history['timestamp'][-1]
+                series = {field: history[field] for field in self.plot_lines}
+                time_label, xmin = 'Time (seconds ago)', -59 * Config.STATS_UPDATE_INTERVAL
+            else:
+                now = time.time()
+                history = self.data_handler.query_stats(now - window, now)
+                if not len(history['timestamp']):
+                    return
+                    
+                time_label, time_scale = self._time_axis(window)
+                times = (history['timestamp'] - now) / time_scale
+                series = {field: history[field]['avg'] for field in self.plot_lines}
+                xmin = -window / time_scale
+                
+            for field, line in self.plot_lines.items():
+                line.set_data(times, series[field])
+                
+            limits = (
+                xmin,
+                time_label,
+                self._plot_ylimit(self.ax1, [series['bytes_sent_rate'], series['bytes_recv_rate']]),
+                self._plot_ylimit(self.ax2, [series['packets_sent_rate'], series['packets_recv_rate']])
+            )
+            self.plot_key = plot_key
             
-            self.fig.tight_layout()
+            if limits != self.plot_limits or self.plot_background is None:
+                self.plot_limits = limits
+                for ax in (self.ax1, self.ax2):
+                    ax.set_xlim(xmin, 0)
+                self.ax1.set_ylim(0, limits[2])
+                self.ax2.set_ylim(0, limits[3])
+                self.ax2.set_xlabel(time_label)
+                self.canvas.draw()
+                return
+                
+            self.canvas.restore_region(self.plot_background)
+            for line in self.plot_lines.values():
+                line.axes.draw_artist(line)
+            self.canvas.blit(self.fig.bbox)
             
         except Exception as e:
             print(f"Plot update error: {e}")
             
+    def start_plot_updates(self):
+        def tick():
+            self.update_plots()
+            self.root.after(2000, tick)
+            
+        self.root.after(2000, tick)
+        
     def start_auto_refresh(self):
         def auto_refresh():
-            if self.monitoring_active:
+            if self.monitoring_active and self.data_handler.changed_since(self.devices_generation, 'devices'):
                 self.refresh_devices()
             self.refresh_interfaces()
+            self.refresh_interface_choices()
             self.root.after(10000, auto_refresh)
             
         self.root.after(1000, auto_refresh)
         
+    def start_event_pump(self):
+        def pump():
+            if self.device_events.drain():
+                self.refresh_devices()
+            self.root.after(Config.GUI_EVENT_POLL_INTERVAL, pump)
+            
+        self.root.after(Config.GUI_EVENT_POLL_INTERVAL, pump)
+        
     def update_status(self, message):
         self.status_label.config(text=message)
         self.root.update_idletasks()
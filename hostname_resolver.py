@@ -0,0 +1,105 @@
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+import metrics
+
+DNS_LOOKUPS = metrics.REGISTRY.histogram('enm_dns_lookup_seconds', 'Reverse DNS lookup time', ('result',))
+DNS_CACHE = metrics.REGISTRY.counter('enm_dns_cache_lookups_total',
+                                     'Hostname requests to the resolver cache, by outcome', ('result',))
+
+class HostnameResolver:
+    def __init__(self, on_resolved=None):
+        self.config = Config()
+        self.on_resolved = on_resolved
+        self.executor = ThreadPoolExecutor(max_workers=self.config.DNS_RESOLVER_THREADS,
+                                           thread_name_prefix='hostname-resolver')
+        self.cache = {}
+        self.pending = set()
+        # Names resolved since the last delivery; a sweep's worth reaches on_resolved as a few batches
+        self.resolved = {}
+        self.flush_timer = None
+        self.lock = threading.Lock()
+    
+    def lookup(self, ip):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.cache.get(ip)
+            if entry is not None:
+                hostname, expires_at = entry
+                DNS_CACHE.labels('negative_hit' if hostname is None else 'hit').inc()
+                if expires_at <= now:
+                    self._schedule(ip)
+                return hostname if hostname is not None else "Unknown"
+            
+            DNS_CACHE.labels('miss').inc()
+            self._schedule(ip)
+            return "Unknown"
+    
+    def cached(self, ip):
+        with self.lock:
+            entry = self.cache.get(ip)
+        if entry is None or entry[0] is None:
+            return "Unknown"
+        return entry[0]
+    
+    def _schedule(self, ip):
+        if ip in self.pending:
+            return
+        self.pending.add(ip)
+        try:
+            self.executor.submit(self._resolve, ip)
+        except RuntimeError:
+            self.pending.discard(ip)
+    
+    def _resolve(self, ip):
+        started = time.monotonic()
+        try:
+            hostname = socket.gethostbyaddr(ip)[0]
+            if hostname == ip:
+                hostname = None
+        except (OSError, UnicodeError):
+            hostname = None
+        finished = time.monotonic()
+        DNS_LOOKUPS.labels('resolved' if hostname is not None else 'failed').observe(finished - started)
+        
+        with self.lock:
+            previous = self.cache.get(ip)
+            ttl = self.config.DNS_CACHE_TTL if hostname is not None else self.config.DNS_NEGATIVE_TTL
+            self.cache[ip] = (hostname, finished + ttl)
+            self.pending.discard(ip)
+            
+            changed = previous is None or previous[0] != hostname
+            if changed and hostname is not None and self.on_resolved:
+                self.resolved[ip] = hostname
+                if self.flush_timer is None:
+                    self.flush_timer = threading.Timer(self.config.DNS_CALLBACK_DELAY, self._flush)
+                    self.flush_timer.daemon = True
+                    self.flush_timer.start()
+    
+    def _flush(self):
+        with self.lock:
+            resolved = self.resolved
+            self.resolved = {}
+            self.flush_timer = None
+        if not resolved:
+            return
+        try:
+            self.on_resolved(resolved)
+        except Exception as e:
+            print(f"Hostname update error: {e}")
+    
+    def get_stats(self):
+        with self.lock:
+            return {
+                'cache_size': len(self.cache),
+                'pending': len(self.pending)
+            }
+    
+    def shutdown(self):
+        with self.lock:
+            timer = self.flush_timer
+        if timer is not None:
+            timer.cancel()
+        self.executor.shutdown(wait=False)
\ No newline at end of file
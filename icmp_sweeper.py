@@ -0,0 +1,181 @@
+import ipaddress
+import os
+import select
+import socket
+import struct
+import sys
+import threading
+import time
+from config import Config
+
+ICMP_ECHO_REPLY = 0
+ICMP_ECHO_REQUEST = 8
+
+class IcmpSweeper:
+    def __init__(self, timeout=None, loopback_only=False, budget=None):
+        self.config = Config()
+        self.budget = budget
+        self.timeout = timeout if timeout is not None else self.config.ICMP_TIMEOUT
+        self.loopback_only = loopback_only
+        self.identifier = os.getpid() & 0xFFFF
+        self.sequence = 0
+        self.sequence_lock = threading.Lock()
+        self.socket_kind = None
+    
+    def _open_socket(self):
+        # Unprivileged ping sockets need net.ipv4.ping_group_range; raw sockets need root/CAP_NET_RAW
+        for kind in (socket.SOCK_DGRAM, socket.SOCK_RAW):
+            try:
+                sock = socket.socket(socket.AF_INET, kind, socket.IPPROTO_ICMP)
+            except (OSError, AttributeError):
+                continue
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.config.ICMP_RECV_BUFFER)
+            except OSError:
+                pass
+            sock.setblocking(False)
+            self.socket_kind = kind
+            return sock
+        raise OSError("ICMP sockets are not permitted for this process")
+    
+    def is_available(self):
+        try:
+            self._open_socket().close()
+            return True
+        except OSError:
+            return False
+    
+    def _next_sequences(self, count):
+        with self.sequence_lock:
+            start = self.sequence
+            self.sequence = (self.sequence + count) & 0xFFFF
+        return [(start + i) & 0xFFFF for i in range(count)]
+    
+    def _checksum(self, data):
+        if len(data) % 2:
+            data += b'\x00'
+        total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+        total = (total >> 16) + (total & 0xFFFF)
+        total += total >> 16
+        return ~total & 0xFFFF
+    
+    def _build_packet(self, sequence):
+        payload = b'EasyNetworkManager'
+        header = struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, 0, self.identifier, sequence)
+        checksum = self._checksum(header + payload)
+        return struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, checksum, self.identifier, sequence) + payload
+    
+    def _parse_reply(self, data):
+        # Raw sockets (and BSD datagram sockets) hand us the IP header as well
+        if data and data[0] >> 4 == 4:
+            data = data[(data[0] & 0x0F) * 4:]
+        if len(data) < 8:
+            return None
+        icmp_type, _, _, identifier, sequence = struct.unpack('!BBHHH', data[:8])
+        if icmp_type != ICMP_ECHO_REPLY:
+            return None
+        # The kernel rewrites the id of datagram ping sockets and filters replies for us
+        if self.socket_kind == socket.SOCK_RAW and identifier != self.identifier:
+            return None
+        return sequence
+    
+    def _drain(self, sock, pending, results):
+        while True:
+            try:
+                data, addr = sock.recvfrom(1024)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+            received_at = time.monotonic()
+            sequence = self._parse_reply(data)
+            if sequence is None or sequence not in pending:
+                continue
+            ip, sent_at = pending[sequence]
+            if addr[0] != ip:
+                continue
+            del pending[sequence]
+            results[ip] = (received_at - sent_at) * 1000
+    
+    def _filter_targets(self, ips):
+        targets = []
+        for ip in ips:
+            if self.loopback_only and not ipaddress.ip_address(ip).is_loopback:
+                continue
+            targets.append(ip)
+        return targets
+    
+    def _pace(self, sock, pending, results, delay):
+        # Replies keep being collected while the send rate is held back, so their RTTs stay accurate
+        until = time.monotonic() + delay
+        while True:
+            remaining = until - time.monotonic()
+            if remaining <= 0:
+                return
+            readable, _, _ = select.select([sock], [], [], remaining)
+            if readable:
+                self._drain(sock, pending, results)
+    
+    def sweep(self, ips, timeout=None):
+        targets = self._filter_targets(ips)
+        if not targets:
+            return {}
+        if timeout is None:
+            timeout = self.timeout
+        
+        pending = {}
+        results = {}
+        
+        with self._open_socket() as sock:
+            for ip, sequence in zip(targets, self._next_sequences(len(targets))):
+                if self.budget is not None:
+                    self._pace(sock, pending, results, self.budget.reserve())
+                try:
+                    sock.sendto(self._build_packet(sequence), (ip, 0))
+                    pending[sequence] = (ip, time.monotonic())
+                except (BlockingIOError, InterruptedError):
+                    select.select([], [sock], [], timeout)
+                    try:
+                        sock.sendto(self._build_packet(sequence), (ip, 0))
+                        pending[sequence] = (ip, time.monotonic())
+                    except OSError:
+                        continue
+                except OSError:
+                    continue
+                self._drain(sock, pending, results)
+            
+            deadline = time.monotonic() + timeout
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                readable, _, _ = select.select([sock], [], [], remaining)
+                if readable:
+                    self._drain(sock, pending, results)
+        
+        return results
+    
+    def ping(self, ip, timeout=None):
+        return self.sweep([ip], timeout).get(ip)
+
+def run_loopback_check(count=4, timeout=1):
+    sweeper = IcmpSweeper(timeout=timeout, loopback_only=True)
+    targets = [f"127.0.0.{i}" for i in range(1, count + 1)]
+    results = sweeper.sweep(targets)
+    
+    kind = {socket.SOCK_DGRAM: 'datagram', socket.SOCK_RAW: 'raw'}.get(sweeper.socket_kind, 'none')
+    print(f"ICMP loopback check using {kind} socket:")
+    for ip in targets:
+        rtt = results.get(ip)
+        print(f"  {ip}: {'%.3f ms' % rtt if rtt is not None else 'no reply'}")
+    return len(results) == len(targets)
+
+if __name__ == "__main__":
+    if '--loopback' not in sys.argv[1:]:
+        print("Usage: python icmp_sweeper.py --loopback")
+        sys.exit(2)
+    try:
+        sys.exit(0 if run_loopback_check() else 1)
+    except OSError as e:
+        print(f"ICMP unavailable: {e}")
+        sys.exit(1)
\ No newline at end of file
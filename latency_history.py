@@ -0,0 +1,77 @@
+import numpy as np
+
+class LatencyHistory:
+    __slots__ = ('rtts', 'times', 'head', 'count', 'sent', 'lost', 'jitter', 'last_rtt', 'last_time', 'summary_cache')
+    
+    def __init__(self, capacity):
+        # Lost probes are stored as NaN so loss and latency share one fixed-size window
+        self.rtts = np.full(capacity, np.nan, dtype=np.float32)
+        self.times = np.zeros(capacity, dtype=np.float64)
+        self.head = 0
+        self.count = 0
+        self.sent = 0
+        self.lost = 0
+        self.jitter = 0.0
+        self.last_rtt = None
+        self.last_time = 0.0
+        self.summary_cache = None
+    
+    def record(self, timestamp, rtt):
+        if timestamp <= self.last_time:
+            return False
+        capacity = len(self.rtts)
+        self.rtts[self.head] = np.nan if rtt is None else rtt
+        self.times[self.head] = timestamp
+        self.head = (self.head + 1) % capacity
+        self.count = min(self.count + 1, capacity)
+        self.last_time = timestamp
+        self.summary_cache = None
+        
+        self.sent += 1
+        if rtt is None:
+            self.lost += 1
+            return True
+        if self.last_rtt is not None:
+            # RFC 3550 interarrival jitter: a 1/16 gain smoothed mean of successive RTT differences
+            self.jitter += (abs(rtt - self.last_rtt) - self.jitter) / 16
+        self.last_rtt = rtt
+        return True
+    
+    def series(self):
+        capacity = len(self.rtts)
+        order = np.arange(self.head - self.count, self.head) % capacity
+        return self.times[order], self.rtts[order].astype(np.float64)
+    
+    def summary(self):
+        if self.summary_cache is not None:
+            return self.summary_cache
+        
+        _, rtts = self.series()
+        answered = rtts[~np.isnan(rtts)]
+        summary = {
+            'samples': int(self.count),
+            'sent': self.sent,
+            'lost': self.lost,
+            'loss_rate': float(np.isnan(rtts).mean()) if self.count else 0.0,
+            'total_loss_rate': self.lost / self.sent if self.sent else 0.0,
+            'jitter_ms': self.jitter,
+            'last_ms': self.last_rtt,
+            'min_ms': None,
+            'avg_ms': None,
+            'max_ms': None,
+            'p50_ms': None,
+            'p95_ms': None,
+            'p99_ms': None
+        }
+        if len(answered):
+            p50, p95, p99 = np.percentile(answered, (50, 95, 99))
+            summary.update(
+                min_ms=float(answered.min()),
+                avg_ms=float(answered.mean()),
+                max_ms=float(answered.max()),
+                p50_ms=float(p50),
+                p95_ms=float(p95),
+                p99_ms=float(p99)
+            )
+        self.summary_cache = summary
+        return summary
\ No newline at end of file
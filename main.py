@@ -1,22 +1,42 @@
 #!/usr/bin/env python3
 
+import time
+START_TIME = time.perf_counter()
+
 import sys
+import argparse
 import threading
-import time
 import signal
-from gui import NetworkMonitorGUI
 from network_monitor import NetworkMonitor
 from data_handler import DataHandler
+from persistence import PersistentStore
+from api_server import ApiServer
+from task_scheduler import TaskScheduler
+from config import Config
 
 class NetworkMonitorApp:
-    def __init__(self):
-        self.data_handler = DataHandler()
+    def __init__(self, headless=False, api=False, api_port=None):
+        self.headless = headless
+        self.store = PersistentStore() if Config.PERSISTENCE_ENABLED else None
+        self.data_handler = DataHandler(self.store)
         self.network_monitor = NetworkMonitor(self.data_handler)
-        self.gui = NetworkMonitorGUI(self.data_handler, self.network_monitor, self)
-        self.running = True
-        self.monitor_thread = None
+        self.api_server = None
+        if api or Config.API_ENABLED:
+            self.api_server = ApiServer(self.data_handler, port=api_port, network_monitor=self.network_monitor)
+            self.api_server.start()
+        self.gui = None
+        if not headless:
+            # tkinter and matplotlib are only imported when a window is actually wanted
+            from gui import NetworkMonitorGUI
+            self.gui = NetworkMonitorGUI(self.data_handler, self.network_monitor, self)
+        self.task_scheduler = None
+        self.stopped = threading.Event()
         
         signal.signal(signal.SIGINT, self.signal_handler)
+        signal.signal(signal.SIGTERM, self.signal_handler)
+        
+        mode = "headless" if headless else "GUI"
+        print(f"Started in {mode} mode in {time.perf_counter() - START_TIME:.2f}s")
         
     def signal_handler(self, signum, frame):
         print("\nReceived interrupt signal, shutting down...")
@@ -24,64 +44,60 @@ class NetworkMonitorApp:
         sys.exit(0)
         
     def start_monitoring(self):
-        if self.monitor_thread and self.monitor_thread.is_alive():
+        if self.task_scheduler and self.task_scheduler.is_running():
             return
             
-        self.running = True
-        self.monitor_thread = threading.Thread(target=self._monitor_loop, daemon=True)
-        self.monitor_thread.start()
+        # Each task runs on its own worker and cadence, so a slow sweep never delays stats sampling
+        self.task_scheduler = TaskScheduler()
+        self.task_scheduler.add_task('stats', self.network_monitor.collect_network_stats,
+                                     Config.STATS_UPDATE_INTERVAL, jitter=0)
+        self.task_scheduler.add_task('discovery', self.network_monitor.incremental_scan, Config.SCAN_INTERVAL)
+        self.task_scheduler.add_task('status', self.network_monitor.update_device_status,
+                                     Config.STATUS_UPDATE_INTERVAL)
+        self.task_scheduler.start()
         print("Network monitoring started")
         
     def stop_monitoring(self):
-        self.running = False
-        if self.monitor_thread:
+        if self.task_scheduler:
             print("Stopping network monitoring...")
-            self.monitor_thread.join(timeout=2)
+            self.task_scheduler.stop()
+            for name, stats in self.task_scheduler.get_stats().items():
+                print(f"  {name}: {stats['runs']} runs, {stats['skipped']} skipped, "
+                      f"{stats['overruns']} overruns, max {stats['max_duration']:.1f}s")
+            self.task_scheduler = None
         print("Network monitoring stopped")
         
-    def _monitor_loop(self):
-        scan_counter = 0
-        
-        while self.running:
-            try:
-                if scan_counter % 6 == 0:
-                    if self.running:
-                        self.network_monitor.scan_network()
-                
-                if self.running:
-                    self.network_monitor.update_device_status()
-                    
-                if self.running:
-                    self.network_monitor.collect_network_stats()
-                
-                scan_counter += 1
-                
-                for _ in range(50):
-                    if not self.running:
-                        break
-                    time.sleep(0.1)
-                    
-            except Exception as e:
-                if self.running:
-                    print(f"Monitoring error: {e}")
-                    time.sleep(10)
-                
-        print("Monitor loop exited")
-                
     def stop(self):
+        if self.stopped.is_set():
+            return
+        self.stopped.set()
         print("Shutting down Easy Network Manager...")
         self.stop_monitoring()
-        if hasattr(self, 'gui') and self.gui:
+        self.network_monitor.shutdown()
+        if self.api_server:
+            self.api_server.stop()
+        if self.store:
+            self.store.close()
+        if self.gui:
             try:
                 self.gui.root.quit()
                 self.gui.root.destroy()
             except:
                 pass
         
+    def _run_headless(self):
+        while not self.stopped.wait(Config.HEADLESS_STATUS_INTERVAL):
+            summary = self.data_handler.get_summary_stats()
+            print(f"Devices: {summary['total_devices']} ({summary['online_devices']} online), "
+                  f"sent {summary['bytes_sent_rate']}/s, received {summary['bytes_recv_rate']}/s")
+            
     def run(self):
         try:
             self.start_monitoring()
-            self.gui.run()
+            if self.headless:
+                self._run_headless()
+            else:
+                self.gui.run()
         except KeyboardInterrupt:
             print("\nKeyboard interrupt received")
         except Exception as e:
@@ -89,9 +105,21 @@ class NetworkMonitorApp:
         finally:
             self.stop()
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Easy Network Manager")
+    parser.add_argument('--headless', action='store_true',
+                        help="run the monitor as a service without the GUI")
+    parser.add_argument('--api', action='store_true',
+                        help="serve devices and stats over HTTP (see API_HOST/API_PORT in config.py)")
+    parser.add_argument('--api-port', type=int, default=None,
+                        help="port for the HTTP API, overrides API_PORT")
+    return parser.parse_args()
+
 if __name__ == "__main__":
+    args = parse_args()
     try:
-        app = NetworkMonitorApp()
+        app = NetworkMonitorApp(headless=args.headless, api=args.api or args.api_port is not None,
+                                api_port=args.api_port)
         app.run()
     except Exception as e:
         print(f"Failed to start application: {e}")
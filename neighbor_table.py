@@ -0,0 +1,97 @@
+import re
+import socket
+import subprocess
+import time
+from config import Config
+
+PROC_NET_ARP = '/proc/net/arp'
+ATF_COM = 0x2
+EMPTY_MACS = ('00:00:00:00:00:00', 'ff:ff:ff:ff:ff:ff')
+MAC_PATTERN = r'((?:[0-9a-fA-F]{1,2}[:-]){5}[0-9a-fA-F]{1,2})'
+ARP_LINE = re.compile(r'(\d{1,3}(?:\.\d{1,3}){3})\D.*?' + MAC_PATTERN)
+
+def _normalize_mac(mac):
+    return ':'.join(part.zfill(2) for part in re.split('[:-]', mac.lower()))
+
+class NeighborTable:
+    def __init__(self, budget=None):
+        self.config = Config()
+        self.budget = budget
+        self.readers = [self._read_ip_neigh, self._read_proc, self._read_arp_command]
+    
+    def _read_ip_neigh(self):
+        output = subprocess.run(['ip', '-4', 'neigh', 'show'], capture_output=True, text=True,
+                                timeout=5, check=True).stdout
+        neighbors = {}
+        for line in output.splitlines():
+            fields = line.split()
+            if 'lladdr' not in fields:
+                continue
+            mac = fields[fields.index('lladdr') + 1].lower()
+            if mac not in EMPTY_MACS:
+                neighbors[fields[0]] = (mac, fields[-1])
+        return neighbors
+    
+    def _read_proc(self):
+        with open(PROC_NET_ARP) as f:
+            lines = f.read().splitlines()[1:]
+        
+        # /proc/net/arp cannot tell a confirmed entry from a stale one, so it only supplies MACs
+        neighbors = {}
+        for line in lines:
+            fields = line.split()
+            if len(fields) < 6:
+                continue
+            ip, flags, mac = fields[0], int(fields[2], 16), fields[3].lower()
+            if flags & ATF_COM and mac not in EMPTY_MACS:
+                neighbors[ip] = (mac, None)
+        return neighbors
+    
+    def _read_arp_command(self):
+        output = subprocess.run(['arp', '-a'], capture_output=True, text=True, timeout=5).stdout
+        neighbors = {}
+        for line in output.splitlines():
+            match = ARP_LINE.search(line)
+            if match:
+                mac = _normalize_mac(match.group(2))
+                if mac not in EMPTY_MACS:
+                    neighbors[match.group(1)] = (mac, None)
+        return neighbors
+    
+    def read(self):
+        # Maps ip -> (mac, neighbor state or None when the source does not report one)
+        for reader in list(self.readers):
+            try:
+                return reader()
+            except (FileNotFoundError, PermissionError):
+                # A missing tool or file is not going to appear, so stop paying for it
+                self.readers.remove(reader)
+            except (OSError, ValueError, subprocess.SubprocessError):
+                # Timeouts and failed runs pass; fall back for this read and try the source again next time
+                continue
+        return {}
+    
+    def reachable(self, neighbors):
+        return {ip for ip, (_, state) in neighbors.items() if state == 'REACHABLE'}
+    
+    def solicit(self, ips, wait=None):
+        # Any datagram to an on-link address makes the kernel ARP for it, even if the host drops
+        # every ICMP echo and TCP SYN; the discard port keeps it harmless if something does answer
+        if wait is None:
+            wait = self.config.ARP_SOLICIT_WAIT
+        
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.setblocking(False)
+            for ip in ips:
+                if self.budget is not None:
+                    # One datagram on one socket holds no slot, so like an ICMP echo it only pays the rate
+                    delay = self.budget.reserve()
+                    if delay:
+                        time.sleep(delay)
+                try:
+                    sock.sendto(b'', (ip, 9))
+                except OSError:
+                    continue
+        
+        time.sleep(wait)
+        return self.read()
\ No newline at end of file
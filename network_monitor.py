@@ -4,21 +4,106 @@ import psutil
 import ipaddress
 import time
 import platform
+import threading
+from itertools import islice
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from config import Config
+from probe_engine import TcpProbeEngine
+from icmp_sweeper import IcmpSweeper
+from scan_scheduler import ScanScheduler
+from hostname_resolver import HostnameResolver
+from probe_cache import ProbeCache
+from probe_budget import ProbeBudget
+from neighbor_table import NeighborTable
+from port_scanner import PortScanner
+from device import Device
+import interface_counters
+import metrics
+
+PROBES = metrics.REGISTRY.counter('enm_probes_total', 'Host probes sent, by method and result',
+                                  ('method', 'result'))
+PROBE_RTT = metrics.REGISTRY.histogram('enm_probe_rtt_seconds', 'Round-trip time of answered probes',
+                                       ('method',))
+SWEEP_DURATION = metrics.REGISTRY.histogram('enm_sweep_duration_seconds', 'Wall time of a scan pass',
+                                            ('kind',), metrics.DURATION_BUCKETS)
+PROBE_CACHE_HITS = metrics.REGISTRY.counter('enm_probe_cache_hits_total',
+                                            'Probes skipped because the host was probed within PROBE_CACHE_TTL')
+SWEEP_OVERRUNS = metrics.REGISTRY.counter('enm_sweep_overruns_total',
+                                          'Scan passes that took longer than their interval', ('kind',))
+PROBE_SHARED = metrics.REGISTRY.counter('enm_probe_shared_total',
+                                        'Probes skipped because another task was already probing the host')
 
 class NetworkMonitor:
     def __init__(self, data_handler):
         self.data_handler = data_handler
         self.config = Config()
+        # Every scan path draws from one rate limit, one in-flight cap and one long-lived ping pool
+        self.probe_budget = ProbeBudget()
+        self.ping_executor = ThreadPoolExecutor(max_workers=self.config.MAX_SCAN_THREADS, thread_name_prefix='ping')
+        self.probe_engine = TcpProbeEngine(budget=self.probe_budget)
+        self.icmp_sweeper = IcmpSweeper(budget=self.probe_budget)
+        self.icmp_available = self.icmp_sweeper.is_available()
+        self.hostname_resolver = HostnameResolver(self.data_handler.update_hostnames)
         self.local_ip = self._get_local_ip()
         self.network_range = self._get_network_range()
         self.scan_method = self._detect_best_scan_method()
+        self.scheduler = ScanScheduler(self.get_scan_networks)
+        self.probe_cache = ProbeCache()
+        self.neighbor_table = NeighborTable(budget=self.probe_budget)
+        self.port_scanner = PortScanner(budget=self.probe_budget)
+        self.full_scan_lock = threading.Lock()
+        self._register_metrics()
         
         print(f"Network Monitor initialized:")
         print(f"  Local IP: {self.local_ip}")
         print(f"  Scan method: {self.scan_method}")
         
+    def _register_metrics(self):
+        # Gauges are computed from current state when scraped, so they cost nothing in between
+        registry = metrics.REGISTRY
+        def device_counts():
+            counts = dict.fromkeys(('online', 'offline', 'unknown'), 0)
+            for device in self.data_handler.get_devices():
+                counts[device.status] = counts.get(device.status, 0) + 1
+            return counts
+        registry.gauge('enm_devices', 'Known devices by status', ('status',)).set_function(device_counts)
+        
+        def interface_rates(kind):
+            # Each NIC under its own name, plus the non-loopback total the stats history is built from
+            snapshot = self.data_handler.get_snapshot()
+            samples = dict(snapshot.latest_interfaces)
+            samples['total'] = snapshot.latest_stats
+            return {(name, direction): (latest or {}).get(f'{kind}_{direction}_rate', 0.0)
+                    for name, latest in samples.items() for direction in ('sent', 'recv')}
+        registry.gauge('enm_network_bytes_per_second', 'Byte rate from the last stats sample, per interface and in total',
+                       ('interface', 'direction')).set_function(lambda: interface_rates('bytes'))
+        registry.gauge('enm_network_packets_per_second', 'Packet rate from the last stats sample, per interface and in total',
+                       ('interface', 'direction')).set_function(lambda: interface_rates('packets'))
+        
+        registry.gauge('enm_dns_pending', 'Reverse DNS lookups queued or in flight').set_function(
+            lambda: self.hostname_resolver.get_stats()['pending'])
+        registry.gauge('enm_dns_cache_entries', 'Addresses in the reverse DNS cache, failed lookups included').set_function(
+            lambda: self.hostname_resolver.get_stats()['cache_size'])
+        registry.gauge('enm_scan_planned_probes_per_second', 'Probe rate the scan scheduler is planning for').set_function(
+            lambda: self.scheduler.get_budget()['planned_probes_per_sec'])
+        registry.gauge('enm_scan_tracked_hosts', 'Hosts with scheduler state').set_function(
+            lambda: self.scheduler.get_budget()['tracked_hosts'])
+        registry.gauge('enm_probes_in_flight', 'Probes holding a slot of the global in-flight cap').set_function(
+            lambda: self.probe_budget.get_stats()['in_flight'])
+        registry.gauge('enm_probe_cache_entries', 'Probe answers held in the probe cache').set_function(
+            lambda: self.probe_cache.get_stats()['size'])
+        
+    def _record_probes(self, method, attempted, results):
+        answered = 0
+        rtt_histogram = PROBE_RTT.labels(method)
+        for ip in attempted:
+            rtt = results.get(ip)
+            if rtt is not None:
+                answered += 1
+                rtt_histogram.observe(rtt / 1000)
+        PROBES.labels(method, 'up').inc(answered)
+        PROBES.labels(method, 'down').inc(len(attempted) - answered)
+        
     def _get_local_ip(self):
         try:
             with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
@@ -44,12 +129,16 @@ class NetworkMonitor:
             
         print("Auto-detecting best scan method...")
         
-        ping_works = self._test_ping_method()
+        icmp_works = self._test_icmp_method()
+        ping_works = icmp_works or self._test_ping_method()
         socket_works = self._test_socket_method()
         
         if ping_works and socket_works:
             print("Both ping and socket methods work - using hybrid")
             return 'hybrid'
+        elif icmp_works:
+            print("Native ICMP works - using icmp")
+            return 'icmp'
         elif ping_works:
             print("Ping method works - using ping")
             return 'ping'
@@ -60,6 +149,14 @@ class NetworkMonitor:
             print("No methods work reliably - using socket as fallback")
             return 'socket'
     
+    def _test_icmp_method(self):
+        if not self.icmp_available:
+            return False
+        try:
+            return self.icmp_sweeper.ping(self.local_ip) is not None
+        except:
+            return False
+    
     def _test_ping_method(self):
         try:
             return self._ping_host(self.local_ip) is not None
@@ -88,148 +185,304 @@ class NetworkMonitor:
         except:
             return None
     
+    def _budgeted_ping(self, ip):
+        self.probe_budget.acquire()
+        try:
+            return self._ping_host(ip)
+        finally:
+            self.probe_budget.release()
+    
     def _socket_check_host(self, ip, timeout=None):
-        if timeout is None:
-            timeout = self.config.get_socket_timeout()
+        result = self.probe_engine.probe_host(ip, self._probe_ports(), timeout)
+        return result[0] if result is not None else None
+    
+    def _probe_ports(self):
+        return self.config.COMMON_PORTS[:self.config.PROBE_PORT_COUNT]
+    
+    def _get_hostname(self, ip):
+        return self.hostname_resolver.lookup(ip)
+    
+    def _refresh_hostnames(self, devices):
+        refreshed = []
+        for device in devices:
+            if device.hostname == "Unknown":
+                device = device.replace(hostname=self.hostname_resolver.cached(device.ip))
+            refreshed.append(device)
+        return refreshed
             
-        for port in self.config.COMMON_PORTS[:5]:
-            try:
-                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                    s.settimeout(timeout)
-                    result = s.connect_ex((ip, port))
-                    if result == 0:
-                        return port
-            except:
-                continue
-        return None
+    def _read_neighbors(self):
+        # Read once per pass and handed to every chunk, so a sweep forks `ip neigh` once, not per chunk
+        return self.neighbor_table.read() if self.config.ARP_DISCOVERY_ENABLED else {}
     
-    def _hybrid_check_host(self, ip):
-        ping_result = self._ping_host(ip)
-        if ping_result is not None:
-            return ping_result
+    def _scan_hosts(self, ips, neighbors):
+        active_devices = []
         
-        socket_result = self._socket_check_host(ip)
-        if socket_result is not None:
-            return 1.0
+        # New addresses the kernel confirmed as reachable very recently are up without sending them anything.
+        # Known devices are still probed so their RTT, open port and latency history stay current
+        known = self.data_handler.get_snapshot().devices_by_ip
+        reachable = self.neighbor_table.reachable(neighbors)
+        passive = {ip for ip in reachable.intersection(ips) if ip not in known}
         
-        return None
-            
-    def _get_hostname(self, ip):
+        # Hosts probed by any task within PROBE_CACHE_TTL reuse that answer instead of being probed again,
+        # and hosts another task is probing right now share its answer once that lands
+        claimed_at = time.monotonic()
+        cached, to_probe, waiting = self.probe_cache.split([ip for ip in ips if ip not in passive])
+        PROBE_CACHE_HITS.inc(len(cached))
+        PROBE_SHARED.inc(len(waiting))
+        results, solicited = self._probe_and_store(to_probe, neighbors, reachable)
+        self.scheduler.record_results(passive, passive, probed=False)
+        
+        if waiting:
+            cached.update(self.probe_cache.wait(waiting, claimed_at))
+            # No shared answer is not proof the host is down, so those are probed here after all
+            stragglers = [ip for ip in waiting if ip not in cached]
+            if stragglers:
+                more_results, more_solicited = self._probe_and_store(stragglers, neighbors, reachable)
+                results.update(more_results)
+                solicited.update(more_solicited)
+        if solicited:
+            neighbors = {**neighbors, **solicited}
+        
+        for ip in ips:
+            if ip in passive:
+                result, seen_at = (None, None), None
+            elif ip in cached:
+                result, _, seen_at = cached[ip]
+            else:
+                result, seen_at = results.get(ip), None
+            if result is not None:
+                mac = neighbors[ip][0] if ip in neighbors else None
+                scan_method = 'arp' if ip in passive or ip in solicited else None
+                active_devices.append(self._build_device(ip, result, seen_at, mac, scan_method))
+                    
+        return active_devices
+    
+    def _probe_and_store(self, ips, neighbors, reachable):
+        # Returns probe results plus the neighbor entries of silent hosts the kernel still reaches
+        solicited = {}
+        if not ips:
+            return {}, solicited
         try:
-            hostname = socket.gethostbyaddr(ip)[0]
-            return hostname if hostname != ip else "Unknown"
-        except:
-            return "Unknown"
+            results = self._check_hosts(ips)
+            self.data_handler.record_latency(ips, {ip: result[0] for ip, result in results.items()})
             
-    def _scan_ip_range(self, start_ip, end_ip):
-        base_ip = '.'.join(start_ip.split('.')[:-1])
-        start_num = int(start_ip.split('.')[-1])
-        end_num = int(end_ip.split('.')[-1])
+            # A firewalled host the kernel reached recently is up, even though it dropped every probe
+            solicited = {ip: neighbors[ip] for ip in reachable.intersection(ips) if ip not in results}
+            silent = [ip for ip in ips if ip not in results and ip not in solicited]
+            if self.config.ARP_DISCOVERY_ENABLED and self.config.ARP_SOLICIT_ENABLED and silent:
+                # Hosts that drop every probe still have to answer ARP to stay on the network
+                answered = self.neighbor_table.solicit(silent)
+                solicited.update({ip: answered[ip] for ip in self.neighbor_table.reachable(answered).intersection(silent)})
+            results.update(dict.fromkeys(solicited, (None, None)))
+        except BaseException:
+            self.probe_cache.release(ips)
+            raise
         
-        active_devices = []
+        self.probe_cache.store(ips, results)
+        self.scheduler.record_results(ips, results)
+        return results, solicited
+    
+    def _build_device(self, ip, result, seen_at=None, mac=None, scan_method=None):
+        hostname = self._get_hostname(ip)
         
-        if self.scan_method == 'ping':
-            check_func = self._ping_host
-            max_workers = self.config.MAX_SCAN_THREADS
-        elif self.scan_method == 'socket':
-            check_func = self._socket_check_host
-            max_workers = self.config.SOCKET_THREADS
-        elif self.scan_method == 'hybrid':
-            check_func = self._hybrid_check_host
-            max_workers = self.config.SOCKET_THREADS
-        else:
-            check_func = self._socket_check_host
-            max_workers = self.config.SOCKET_THREADS
+        ping_time, port = result
+        extra_info = None
+        if self.scan_method == 'socket' and port is not None:
+            extra_info = f"Port {port} ({self.config.get_service_name(port)})"
         
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = {}
-            
-            for i in range(start_num, end_num + 1):
-                ip = f"{base_ip}.{i}"
-                futures[executor.submit(check_func, ip)] = ip
-                
+        return Device(
+            ip=ip,
+            hostname=hostname,
+            ping_time=ping_time,
+            status='online',
+            last_seen=seen_at or time.time(),
+            scan_method=scan_method or self.scan_method,
+            extra_info=extra_info,
+            mac=mac
+        )
+    
+    def _check_hosts(self, ips):
+        # Results map each responding ip to (rtt_ms, open port or None)
+        if self.scan_method == 'icmp':
+            rtts = self.icmp_sweeper.sweep(ips)
+            self._record_probes('icmp', ips, rtts)
+            return {ip: (rtt, None) for ip, rtt in rtts.items()}
+        
+        results = {}
+        
+        if self.scan_method == 'hybrid' and self.icmp_available:
+            rtts = self.icmp_sweeper.sweep(ips)
+            self._record_probes('icmp', ips, rtts)
+            results.update((ip, (rtt, None)) for ip, rtt in rtts.items())
+            ips = [ip for ip in ips if ip not in results]
+        elif self.scan_method in ('ping', 'hybrid'):
+            rtts = {}
+            futures = {self.ping_executor.submit(self._budgeted_ping, ip): ip for ip in ips}
             for future in as_completed(futures):
-                ip = futures[future]
-                result = future.result()
-                
-                if result is not None:
-                    hostname = self._get_hostname(ip)
-                    
-                    if self.scan_method == 'socket' and isinstance(result, int):
-                        service = self.config.get_service_name(result)
-                        ping_time = 1.0
-                        extra_info = f"Port {result} ({service})"
-                    else:
-                        ping_time = result if isinstance(result, float) else 1.0
-                        extra_info = None
-                    
-                    device = {
-                        'ip': ip,
-                        'hostname': hostname,
-                        'ping_time': ping_time,
-                        'status': 'online',
-                        'last_seen': time.time(),
-                        'scan_method': self.scan_method,
-                        'extra_info': extra_info
-                    }
-                    active_devices.append(device)
+                rtt = future.result()
+                if rtt is not None:
+                    rtts[futures[future]] = rtt
+                        
+            self._record_probes('ping', ips, rtts)
+            results.update((ip, (rtt, None)) for ip, rtt in rtts.items())
+            if self.scan_method == 'ping':
+                return results
+            ips = [ip for ip in ips if ip not in results]
+            
+        probed = self.probe_engine.probe_hosts(ips, self._probe_ports())
+        self._record_probes('socket', ips, {ip: rtt for ip, (port, rtt) in probed.items()})
+        for ip, (port, rtt) in probed.items():
+            results[ip] = (rtt, port)
+            
+        return results
+        
+    def _chunked(self, iterable, size):
+        iterator = iter(iterable)
+        while True:
+            chunk = list(islice(iterator, size))
+            if not chunk:
+                return
+            yield chunk
+    
+    def get_scan_networks(self):
+        networks = []
+        
+        if self.config.SCAN_NETWORKS:
+            for cidr in self.config.SCAN_NETWORKS:
+                try:
+                    networks.append(ipaddress.IPv4Network(cidr, strict=False))
+                except ValueError:
+                    print(f"Ignoring invalid scan network: {cidr}")
+        else:
+            for interface in self.get_interface_info():
+                for addr in interface['addresses']:
+                    try:
+                        network = ipaddress.IPv4Network(f"{addr['ip']}/{addr['netmask']}", strict=False)
+                    except (ValueError, TypeError):
+                        continue
+                    if network.is_loopback or network.is_link_local:
+                        continue
+                    if network.prefixlen < self.config.MIN_SCAN_PREFIX:
+                        network = ipaddress.IPv4Network(f"{addr['ip']}/{self.config.MIN_SCAN_PREFIX}", strict=False)
+                    networks.append(network)
                     
-        return active_devices
+        if not networks:
+            network_address, netmask = self.network_range
+            networks.append(ipaddress.IPv4Network(f"{network_address}/{netmask}", strict=False))
+            
+        return list(ipaddress.collapse_addresses(networks))
+    
+    def iter_scan_hosts(self, networks=None):
+        if networks is None:
+            networks = self.get_scan_networks()
+        for network in networks:
+            for address in network.hosts():
+                yield str(address)
+        
+    def _record_sweep(self, kind, started, interval):
+        duration = time.monotonic() - started
+        SWEEP_DURATION.labels(kind).observe(duration)
+        if duration > interval:
+            SWEEP_OVERRUNS.labels(kind).inc()
+            print(f"{kind.title()} scan took {duration:.1f}s, longer than its {interval}s interval")
         
     def scan_network(self):
-        print(f"Scanning network using {self.scan_method} method...")
-        network_base = '.'.join(self.local_ip.split('.')[:-1])
-        start_ip = f"{network_base}.1"
-        end_ip = f"{network_base}.254"
+        # A scan requested while a full scan is running, e.g. a manual one next to the monitor loop,
+        # waits for that scan and shares its results instead of sweeping everything a second time
+        if not self.full_scan_lock.acquire(blocking=False):
+            with self.full_scan_lock:
+                return
+        try:
+            self._scan_all_networks()
+        finally:
+            self.full_scan_lock.release()
         
-        devices = self._scan_ip_range(start_ip, end_ip)
+    def _scan_all_networks(self):
+        started = time.monotonic()
+        networks = self.get_scan_networks()
+        print(f"Scanning {', '.join(str(n) for n in networks)} using {self.scan_method} method...")
+        
+        devices = []
+        neighbors = self._read_neighbors()
+        for chunk in self._chunked(self.iter_scan_hosts(networks), self.config.SCAN_CHUNK_SIZE):
+            devices.extend(self._scan_hosts(chunk, neighbors))
         print(f"Found {len(devices)} active devices")
-        self.data_handler.update_devices(devices)
+        self.scheduler.mark_full_sweep()
+        self.data_handler.update_devices(self._refresh_hostnames(devices))
+        self._record_sweep('full', started, self.config.SCAN_INTERVAL)
         
-    def update_device_status(self):
-        devices = self.data_handler.get_devices()
+    def _probe_batch(self, batch, chunk_size=None):
+        found = []
+        neighbors = self._read_neighbors()
+        for chunk in self._chunked(batch, chunk_size or self.config.SCAN_CHUNK_SIZE):
+            found.extend(self._scan_hosts(chunk, neighbors))
+            
+        found_ips = {device.ip for device in found}
+        missed = [ip for ip in batch if ip not in found_ips]
+        self.data_handler.apply_probe_results(self._refresh_hostnames(found), missed)
+        return found
         
-        if not devices:
+    def incremental_scan(self):
+        if self.scheduler.needs_initial_sweep():
+            self.scan_network()
             return
         
-        if self.scan_method == 'ping':
-            check_func = self._ping_host
-            max_workers = self.config.MAX_STATUS_THREADS
-        elif self.scan_method == 'socket':
-            check_func = self._socket_check_host  
-            max_workers = min(self.config.MAX_STATUS_THREADS, 10)
-        else:
-            check_func = self._hybrid_check_host
-            max_workers = min(self.config.MAX_STATUS_THREADS, 10)
+        # Discovery only covers the next slice of the rolling sweep; known hosts are left to update_device_status
+        started = time.monotonic()
+        batch = self.scheduler.sweep_hosts()
+        found = self._probe_batch(batch)
+        self._record_sweep('discovery', started, self.config.SCAN_INTERVAL)
         
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = {}
-            
-            for device in devices:
-                futures[executor.submit(check_func, device['ip'])] = device
-                
-            for future in as_completed(futures):
-                device = futures[future]
-                result = future.result()
-                
-                if result is not None:
-                    device['ping_time'] = result if isinstance(result, float) else 1.0
-                    device['status'] = 'online'
-                    device['last_seen'] = time.time()
-                else:
-                    device['status'] = 'offline'
-                    
-        self.data_handler.update_device_list(devices)
+        budget = self.scheduler.get_budget()
+        print(f"Probed {len(batch)} addresses, {len(found)} online "
+              f"(budget {budget['planned_probes_per_sec']:.1f} probes/s, "
+              f"{budget['tracked_hosts']} tracked of {budget['universe_size']})")
+        
+    def scan_ports(self, ips, ports=None, banners=None, refresh=False):
+        ips = [str(ipaddress.IPv4Address(ip)) for ip in ips]
+        return self.port_scanner.scan(ips, ports, banners, refresh)
+        
+    def scan_subnet_ports(self, network, ports=None, banners=None, refresh=False):
+        # Only devices currently online are inventoried; discovery already knows which addresses are live
+        network = ipaddress.ip_network(network, strict=False)
+        ips = [device.ip for device in self.data_handler.get_online_devices()
+               if ipaddress.ip_address(device.ip) in network]
+        return self.scan_ports(ips, ports, banners, refresh)
+        
+    def get_port_inventory(self, ip):
+        return self.port_scanner.get_inventory(ip)
+        
+    def shutdown(self):
+        self.hostname_resolver.shutdown()
+        self.ping_executor.shutdown(wait=False)
+        
+    def update_device_status(self):
+        if self.scheduler.needs_initial_sweep():
+            return
+        
+        started = time.monotonic()
+        batch = self.scheduler.due_hosts()
+        # Devices restored from the database have no scheduler state until they are probed once
+        batch.extend(device.ip for device in self.data_handler.get_devices()
+                     if device.status == 'unknown' and not self.scheduler.is_tracked(device.ip))
+        if not batch:
+            return
+        
+        # Known hosts go out as a single round so a status pass costs one probe timeout, not one per chunk
+        self._probe_batch(batch, len(batch))
+        self._record_sweep('status', started, self.config.STATUS_UPDATE_INTERVAL)
         
     def collect_network_stats(self):
-        stats = psutil.net_io_counters()
+        interfaces = interface_counters.read_interface_counters()
+        totals = interface_counters.aggregate(interfaces)
         
         network_stats = {
-            'bytes_sent': stats.bytes_sent,
-            'bytes_recv': stats.bytes_recv,
-            'packets_sent': stats.packets_sent,
-            'packets_recv': stats.packets_recv,
-            'timestamp': time.time()
+            'bytes_sent': totals['bytes_sent'],
+            'bytes_recv': totals['bytes_recv'],
+            'packets_sent': totals['packets_sent'],
+            'packets_recv': totals['packets_recv'],
+            'timestamp': time.time(),
+            'interfaces': interfaces
         }
         
         self.data_handler.add_network_stats(network_stats)
@@ -267,8 +520,12 @@ class NetworkMonitor:
         }
         
     def change_scan_method(self, method):
+        if method == 'icmp' and not self.icmp_available:
+            print("ICMP sockets are not permitted for this process")
+            return False
         if method in self.config.SCANNING_METHODS:
             self.scan_method = method
+            self.probe_cache.clear()
             print(f"Scanning method changed to: {method}")
             return True
         return False
\ No newline at end of file
@@ -0,0 +1,131 @@
+import queue
+import sqlite3
+import threading
+import time
+from config import Config
+
+DEVICE_COLUMNS = ('ip', 'hostname', 'ping_time', 'status', 'last_seen', 'scan_method', 'extra_info', 'mac')
+STATS_COLUMNS = ('timestamp', 'bytes_sent', 'bytes_recv', 'packets_sent', 'packets_recv')
+
+class PersistentStore:
+    def __init__(self, path=None):
+        self.config = Config()
+        self.path = path or self.config.DB_PATH
+        self.queue = queue.Queue(maxsize=self.config.PERSIST_QUEUE_SIZE)
+        self.dropped = 0
+        self.running = True
+        
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("CREATE TABLE IF NOT EXISTS devices ("
+                             "ip TEXT PRIMARY KEY, hostname TEXT, ping_time REAL, status TEXT, "
+                             "last_seen REAL, scan_method TEXT, extra_info TEXT, mac TEXT)")
+                # Databases written before MAC addresses were tracked lack the column
+                columns = {row[1] for row in conn.execute("PRAGMA table_info(devices)")}
+                if 'mac' not in columns:
+                    conn.execute("ALTER TABLE devices ADD COLUMN mac TEXT")
+                conn.execute("CREATE TABLE IF NOT EXISTS stats ("
+                             "timestamp REAL PRIMARY KEY, bytes_sent REAL, bytes_recv REAL, "
+                             "packets_sent REAL, packets_recv REAL)")
+        finally:
+            conn.close()
+        
+        self.writer_thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self.writer_thread.start()
+    
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+    
+    def _enqueue(self, kind, rows):
+        try:
+            self.queue.put_nowait((kind, rows))
+        except queue.Full:
+            self.dropped += 1
+    
+    def record_devices(self, devices):
+        rows = [tuple(getattr(device, column) for column in DEVICE_COLUMNS) for device in devices]
+        if rows:
+            self._enqueue('devices', rows)
+    
+    def forget_devices(self, ips):
+        self._enqueue('removed', [(ip,) for ip in ips])
+    
+    def record_stats(self, stats):
+        self._enqueue('stats', [tuple(stats[column] for column in STATS_COLUMNS)])
+    
+    def _writer_loop(self):
+        conn = self._connect()
+        last_prune = 0
+        
+        while self.running or not self.queue.empty():
+            try:
+                kind, rows = self.queue.get(timeout=self.config.PERSIST_FLUSH_INTERVAL)
+            except queue.Empty:
+                continue
+            
+            # Writes keep their queue order, so a device removed and then seen again ends up stored
+            batch = [(kind, list(rows))]
+            size = len(rows)
+            while size < self.config.PERSIST_BATCH_SIZE:
+                try:
+                    kind, rows = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if batch[-1][0] == kind:
+                    batch[-1][1].extend(rows)
+                else:
+                    batch.append((kind, list(rows)))
+                size += len(rows)
+            
+            try:
+                with conn:
+                    self._write_batch(conn, batch)
+                    if time.time() - last_prune > 3600:
+                        self._prune(conn)
+                        last_prune = time.time()
+            except sqlite3.Error as e:
+                print(f"Persistence error: {e}")
+        
+        conn.close()
+    
+    def _write_batch(self, conn, batch):
+        for kind, rows in batch:
+            if kind == 'devices':
+                placeholders = ', '.join('?' for _ in DEVICE_COLUMNS)
+                conn.executemany(f"INSERT OR REPLACE INTO devices ({', '.join(DEVICE_COLUMNS)}) "
+                                 f"VALUES ({placeholders})", rows)
+            elif kind == 'removed':
+                conn.executemany("DELETE FROM devices WHERE ip = ?", rows)
+            else:
+                placeholders = ', '.join('?' for _ in STATS_COLUMNS)
+                conn.executemany(f"INSERT OR REPLACE INTO stats ({', '.join(STATS_COLUMNS)}) "
+                                 f"VALUES ({placeholders})", rows)
+    
+    def _prune(self, conn):
+        cutoff = time.time() - self.config.PERSIST_RETENTION
+        conn.execute("DELETE FROM stats WHERE timestamp < ?", (cutoff,))
+        conn.execute("DELETE FROM devices WHERE last_seen < ?", (cutoff,))
+    
+    def _query(self, sql, params=()):
+        conn = self._connect()
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+    
+    def load_devices(self):
+        rows = self._query(f"SELECT {', '.join(DEVICE_COLUMNS)} FROM devices")
+        return [dict(zip(DEVICE_COLUMNS, row)) for row in rows]
+    
+    def load_stats(self, since):
+        rows = self._query(f"SELECT {', '.join(STATS_COLUMNS)} FROM stats "
+                           f"WHERE timestamp >= ? ORDER BY timestamp", (since,))
+        return [dict(zip(STATS_COLUMNS, row)) for row in rows]
+    
+    def close(self):
+        self.running = False
+        self.writer_thread.join(timeout=self.config.PERSIST_FLUSH_INTERVAL + 3)
\ No newline at end of file
@@ -0,0 +1,210 @@
+import asyncio
+import re
+import socket
+import threading
+import time
+from config import Config
+from probe_engine import limit_in_flight
+from rate_limit import TokenBucket
+import metrics
+
+PORT_PROBES = metrics.REGISTRY.counter('enm_port_probes_total', 'Port inventory connects by result', ('result',))
+
+HTTP_REQUEST = b'HEAD / HTTP/1.0\r\n\r\n'
+
+# What a service says first identifies it whatever port it was moved to
+BANNER_SIGNATURES = (
+    (re.compile(rb'^SSH-'), 'SSH'),
+    (re.compile(rb'^HTTP/\d'), 'HTTP'),
+    (re.compile(rb'^220[ -].*FTP', re.I), 'FTP'),
+    (re.compile(rb'^220[ -].*(SMTP|MAIL)', re.I), 'SMTP'),
+    (re.compile(rb'^\+OK'), 'POP3'),
+    (re.compile(rb'^\* OK'), 'IMAP'),
+    (re.compile(rb'^RFB \d'), 'VNC'),
+    (re.compile(rb'^\xff[\xfb-\xfe]'), 'Telnet'),
+    (re.compile(rb'^.\x00\x00\x00\x0a\d', re.S), 'MySQL')
+)
+
+def parse_ports(spec=None):
+    # Accepts '22,80,8000-8100', an iterable of ports, or None for Config.PORT_SCAN_PORTS
+    if spec is None:
+        spec = Config.PORT_SCAN_PORTS
+    if spec is None:
+        return sorted(Config.PORT_SERVICES)
+    
+    if isinstance(spec, str):
+        ports = set()
+        for part in spec.replace(' ', '').split(','):
+            if not part:
+                continue
+            first, _, last = part.partition('-')
+            first = int(first)
+            last = int(last) if last else first
+            if first > last:
+                raise ValueError(f"invalid port range: {part}")
+            ports.update(range(first, last + 1))
+    else:
+        ports = {int(port) for port in spec}
+    
+    if not ports or min(ports) < 1 or max(ports) > 65535:
+        raise ValueError("ports must be between 1 and 65535")
+    return sorted(ports)
+
+def identify_service(port, banner):
+    for pattern, service in BANNER_SIGNATURES:
+        if pattern.search(banner):
+            return service, True
+    return Config.get_service_name(port), False
+
+def banner_text(banner):
+    lines = banner.decode('latin-1').splitlines()
+    if not lines:
+        return None
+    text = lines[0]
+    if lines[0].startswith('HTTP/'):
+        server = next((line for line in lines[1:] if line.lower().startswith('server:')), None)
+        if server:
+            text += f" ({server[7:].strip()})"
+    text = ''.join(char if char.isprintable() else '.' for char in text)
+    return text[:Config.PORT_SCAN_BANNER_LENGTH] or None
+
+class PortScanner:
+    def __init__(self, max_in_flight=None, rate=None, budget=None):
+        self.config = Config()
+        self.budget = budget
+        self.max_in_flight = limit_in_flight(max_in_flight or self.config.PORT_SCAN_MAX_IN_FLIGHT)
+        # Shared by every scan, so concurrent requests cannot add up to more than the configured rate
+        self.bucket = TokenBucket(rate if rate is not None else self.config.PORT_SCAN_RATE, self.config.PORT_SCAN_BURST)
+        
+        # ip -> (monotonic scan time, scanned ports, banners grabbed, inventory)
+        self.inventory = {}
+        self.lock = threading.Lock()
+        self.connects = 0
+    
+    def _covers(self, entry, ports, banners, now):
+        if entry is None or now - entry[0] >= self.config.PORT_SCAN_CACHE_TTL:
+            return False
+        return (entry[2] or not banners) and entry[1].issuperset(ports)
+    
+    def scan(self, ips, ports=None, banners=None, refresh=False):
+        ports = parse_ports(ports)
+        if banners is None:
+            banners = self.config.PORT_SCAN_BANNERS
+        
+        # A cached inventory is reused when it covered at least the requested ports
+        now = time.monotonic()
+        inventories = {}
+        targets = []
+        with self.lock:
+            for ip in dict.fromkeys(ips):
+                entry = self.inventory.get(ip)
+                if not refresh and self._covers(entry, ports, banners, now):
+                    inventories[ip] = entry[3]
+                else:
+                    targets.append(ip)
+        if not targets:
+            return inventories
+        
+        started = time.monotonic()
+        scanned_at = time.time()
+        results = asyncio.run(self._scan_all(targets, ports, banners))
+        duration = time.monotonic() - started
+        
+        with self.lock:
+            for ip, result in results.items():
+                result['open'].sort(key=lambda entry: entry['port'])
+                inventory = dict(ip=ip, scanned_at=scanned_at, duration=duration, ports_scanned=len(ports),
+                                 banners=banners, **result)
+                self.inventory[ip] = (started, frozenset(ports), banners, inventory)
+                inventories[ip] = inventory
+            self.inventory = {ip: entry for ip, entry in self.inventory.items()
+                              if started - entry[0] < self.config.PORT_SCAN_CACHE_TTL}
+        return inventories
+    
+    def get_inventory(self, ip):
+        with self.lock:
+            entry = self.inventory.get(ip)
+        if entry is None or time.monotonic() - entry[0] >= self.config.PORT_SCAN_CACHE_TTL:
+            return None
+        return entry[3]
+    
+    def get_stats(self):
+        with self.lock:
+            return {
+                'cached_devices': len(self.inventory),
+                'connects': self.connects,
+                'rate_limit': self.bucket.rate,
+                'max_in_flight': self.max_in_flight
+            }
+    
+    async def _scan_all(self, targets, ports, banners):
+        results = {ip: {'open': [], 'closed': 0, 'filtered': 0} for ip in targets}
+        # Ports are the outer loop so consecutive connects spread over hosts instead of hammering one.
+        # A fixed set of workers pulls from one generator, so memory stays flat even for 65535 ports
+        pairs = ((ip, port) for port in ports for ip in targets)
+        workers = min(self.max_in_flight, len(targets) * len(ports))
+        await asyncio.gather(*(self._worker(pairs, results, banners) for _ in range(workers)))
+        return results
+    
+    async def _worker(self, pairs, results, banners):
+        for ip, port in pairs:
+            delay = self.bucket.reserve()
+            if delay:
+                await asyncio.sleep(delay)
+            
+            if self.budget is not None:
+                await self.budget.acquire_async()
+            try:
+                outcome, found = await self._probe(ip, port, banners)
+            finally:
+                if self.budget is not None:
+                    self.budget.release()
+            with self.lock:
+                self.connects += 1
+            PORT_PROBES.labels(outcome).inc()
+            if found is not None:
+                results[ip]['open'].append(found)
+            else:
+                results[ip][outcome] += 1
+    
+    async def _probe(self, ip, port, banners):
+        loop = asyncio.get_running_loop()
+        try:
+            # Running out of descriptors (EMFILE) costs this port, not the whole inventory
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        except OSError:
+            return 'filtered', None
+        sock.setblocking(False)
+        try:
+            started = time.monotonic()
+            try:
+                await asyncio.wait_for(loop.sock_connect(sock, (ip, port)), self.config.PORT_SCAN_TIMEOUT)
+            except ConnectionRefusedError:
+                return 'closed', None
+            except (OSError, asyncio.TimeoutError):
+                return 'filtered', None
+            rtt = (time.monotonic() - started) * 1000
+            
+            banner = await self._grab_banner(loop, sock, port) if banners else b''
+            service, confirmed = identify_service(port, banner)
+            return 'open', {
+                'port': port,
+                'service': service,
+                'confirmed': confirmed,
+                'banner': banner_text(banner),
+                'rtt_ms': rtt
+            }
+        finally:
+            sock.close()
+    
+    async def _grab_banner(self, loop, sock, port):
+        # TLS services stay silent until a handshake, so waiting on them only burns the timeout
+        if port in self.config.PORT_SCAN_TLS_PORTS:
+            return b''
+        try:
+            if port in self.config.PORT_SCAN_HTTP_PORTS:
+                await loop.sock_sendall(sock, HTTP_REQUEST)
+            return await asyncio.wait_for(loop.sock_recv(sock, self.config.PORT_SCAN_BANNER_BYTES),
+                                          self.config.PORT_SCAN_BANNER_TIMEOUT)
+        except (OSError, asyncio.TimeoutError):
+            return b''
\ No newline at end of file
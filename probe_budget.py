@@ -0,0 +1,113 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from config import Config
+from probe_engine import limit_in_flight
+from rate_limit import TokenBucket
+
+class ProbeBudget:
+    def __init__(self, rate=None, max_in_flight=None):
+        self.config = Config()
+        self.bucket = TokenBucket(rate if rate is not None else self.config.PROBE_RATE_LIMIT, self.config.PROBE_RATE_BURST)
+        self.max_in_flight = limit_in_flight(max_in_flight or self.config.PROBE_GLOBAL_IN_FLIGHT)
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.lock = threading.Lock()
+        # Threads and coroutines waiting on a slot, in arrival order: (None, Event) or (loop, future).
+        # release() claims the slot for the first one and wakes it, so neither kind can starve the other
+        self.waiters = deque()
+        self.sent = 0
+        self.throttled = 0.0
+    
+    def reserve(self):
+        # Rate only: for probes like ICMP echoes that hold no descriptor while they wait for an answer
+        delay = self.bucket.reserve()
+        with self.lock:
+            self.sent += 1
+            self.throttled += delay
+        return delay
+    
+    def _claim(self):
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+    
+    def acquire(self):
+        waiter = None
+        with self.lock:
+            if self.in_flight < self.max_in_flight and not self.waiters:
+                self._claim()
+            else:
+                waiter = threading.Event()
+                self.waiters.append((None, waiter))
+        if waiter is not None:
+            waiter.wait()
+        delay = self.reserve()
+        if delay:
+            time.sleep(delay)
+    
+    async def acquire_async(self):
+        # An event loop cannot block on an Event, so it parks a future that release() resolves
+        loop = asyncio.get_running_loop()
+        waiter = None
+        with self.lock:
+            if self.in_flight < self.max_in_flight and not self.waiters:
+                self._claim()
+            else:
+                waiter = loop.create_future()
+                self.waiters.append((loop, waiter))
+        
+        if waiter is not None:
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                with self.lock:
+                    try:
+                        self.waiters.remove((loop, waiter))
+                    except ValueError:
+                        pass
+                # A slot granted just before the cancellation landed has to be given back
+                if waiter.done() and not waiter.cancelled():
+                    self.release()
+                raise
+        try:
+            delay = self.reserve()
+            if delay:
+                await asyncio.sleep(delay)
+        except BaseException:
+            self.release()
+            raise
+    
+    def _grant(self, waiter):
+        if waiter.cancelled():
+            self.release()
+        else:
+            waiter.set_result(None)
+    
+    def release(self):
+        with self.lock:
+            self.in_flight -= 1
+            while self.waiters:
+                loop, waiter = self.waiters.popleft()
+                # The slot is claimed on the waiter's behalf before it gets to run
+                self._claim()
+                if loop is None:
+                    waiter.set()
+                    return
+                try:
+                    loop.call_soon_threadsafe(self._grant, waiter)
+                    return
+                except RuntimeError:
+                    # Its event loop has already closed
+                    self.in_flight -= 1
+    
+    def get_stats(self):
+        with self.lock:
+            return {
+                'rate_limit': self.bucket.rate,
+                'max_in_flight': self.max_in_flight,
+                'in_flight': self.in_flight,
+                'peak_in_flight': self.peak_in_flight,
+                'sent': self.sent,
+                'throttled_seconds': self.throttled
+            }
\ No newline at end of file
@@ -0,0 +1,86 @@
+import threading
+import time
+from config import Config
+
+class ProbeCache:
+    def __init__(self, ttl=None):
+        self.config = Config()
+        self.ttl = ttl if ttl is not None else self.config.PROBE_CACHE_TTL
+        # ip -> (result or None, monotonic probe time, wall-clock probe time)
+        self.entries = {}
+        # ip -> Event set once the caller that claimed the address stores or gives up its result
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.last_prune = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+    
+    def split(self, ips, now=None):
+        # Addresses another task is probing right now are handed back as waiting instead of probed twice
+        if now is None:
+            now = time.monotonic()
+        cached = {}
+        to_probe = []
+        waiting = []
+        claim = threading.Event()
+        with self.lock:
+            for ip in ips:
+                entry = self.entries.get(ip)
+                if entry is not None and now - entry[1] < self.ttl:
+                    cached[ip] = entry
+                elif ip in self.pending:
+                    waiting.append(ip)
+                else:
+                    to_probe.append(ip)
+                    self.pending[ip] = claim
+            self.hits += len(cached)
+            self.misses += len(to_probe)
+            self.shared += len(waiting)
+        return cached, to_probe, waiting
+    
+    def wait(self, ips, since, timeout=None):
+        if timeout is None:
+            timeout = self.config.PROBE_WAIT_TIMEOUT
+        deadline = time.monotonic() + timeout
+        with self.lock:
+            claims = {self.pending[ip] for ip in ips if ip in self.pending}
+        for claim in claims:
+            claim.wait(max(0.0, deadline - time.monotonic()))
+        # Only answers stored since the caller split count; a claim that timed out or failed leaves none
+        with self.lock:
+            return {ip: self.entries[ip] for ip in ips if ip in self.entries and self.entries[ip][1] >= since}
+    
+    def release(self, ips):
+        with self.lock:
+            claims = {self.pending.pop(ip) for ip in ips if ip in self.pending}
+        for claim in claims:
+            claim.set()
+    
+    def store(self, ips, results, now=None):
+        if now is None:
+            now = time.monotonic()
+        wall = time.time()
+        with self.lock:
+            for ip in ips:
+                self.entries[ip] = (results.get(ip), now, wall)
+            if now - self.last_prune > self.ttl:
+                self.entries = {ip: entry for ip, entry in self.entries.items() if now - entry[1] < self.ttl}
+                self.last_prune = now
+        self.release(ips)
+    
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+    
+    def get_stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'shared': self.shared,
+                'pending': len(self.pending),
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
\ No newline at end of file
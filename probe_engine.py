@@ -0,0 +1,97 @@
+import asyncio
+import math
+import socket
+import time
+from config import Config
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+def limit_in_flight(requested):
+    # Every pending connect holds a descriptor, so stay well below RLIMIT_NOFILE
+    if resource is None:
+        return requested
+    try:
+        soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    except (ValueError, OSError):
+        return requested
+    if soft == resource.RLIM_INFINITY:
+        return requested
+    return max(1, min(requested, soft // 2))
+
+class TcpProbeEngine:
+    def __init__(self, max_in_flight=None, timeout=None, budget=None):
+        self.config = Config()
+        self.budget = budget
+        self.max_in_flight = limit_in_flight(max_in_flight or self.config.PROBE_MAX_IN_FLIGHT)
+        self.timeout = timeout if timeout is not None else self.config.get_socket_timeout()
+    
+    def probe_hosts(self, ips, ports, timeout=None):
+        ips = list(ips)
+        ports = list(ports)
+        if not ips or not ports:
+            return {}
+        if timeout is None:
+            timeout = self.timeout
+        return asyncio.run(self._probe_all(ips, ports, timeout))
+    
+    def probe_host(self, ip, ports, timeout=None):
+        return self.probe_hosts([ip], ports, timeout).get(ip)
+    
+    async def _probe_all(self, ips, ports, timeout):
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+        waves = math.ceil(len(ips) * len(ports) / self.max_in_flight)
+        # Time spent queueing behind other scans for the shared budget is not held against these hosts;
+        # every connect is still bounded by its own timeout once it holds a slot
+        deadline = math.inf if self.budget is not None else loop.time() + timeout * waves
+        results = {}
+        
+        tasks = [asyncio.ensure_future(self._probe_host(ip, ports, semaphore, deadline, timeout, results))
+                 for ip in ips]
+        wait_timeout = None if self.budget is not None else max(0, deadline - loop.time()) + 0.1
+        done, pending = await asyncio.wait(tasks, timeout=wait_timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return results
+    
+    async def _probe_host(self, ip, ports, semaphore, deadline, timeout, results):
+        attempts = [asyncio.ensure_future(self._connect(ip, port, semaphore, deadline, timeout))
+                    for port in ports]
+        try:
+            for attempt in asyncio.as_completed(attempts):
+                result = await attempt
+                if result is not None:
+                    results[ip] = result
+                    return
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+            await asyncio.gather(*attempts, return_exceptions=True)
+    
+    async def _connect(self, ip, port, semaphore, deadline, timeout):
+        loop = asyncio.get_running_loop()
+        async with semaphore:
+            if self.budget is not None:
+                await self.budget.acquire_async()
+            try:
+                remaining = min(timeout, deadline - loop.time())
+                if remaining <= 0:
+                    return None
+                
+                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                sock.setblocking(False)
+                try:
+                    started = time.monotonic()
+                    await asyncio.wait_for(loop.sock_connect(sock, (ip, port)), remaining)
+                    return port, (time.monotonic() - started) * 1000
+                except (OSError, asyncio.TimeoutError):
+                    return None
+                finally:
+                    sock.close()
+            finally:
+                if self.budget is not None:
+                    self.budget.release()
\ No newline at end of file
@@ -0,0 +1,31 @@
+import threading
+import time
+
+class TokenBucket:
+    def __init__(self, rate, burst=None):
+        # A rate of None or 0 disables limiting
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1.0, rate or 0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def reserve(self, count=1):
+        # Returns how long the caller has to wait before sending. The balance may go negative,
+        # so concurrent callers queue up behind each other instead of all waking at once
+        if not self.rate:
+            return 0.0
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= count
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+    
+    def acquire(self, count=1):
+        delay = self.reserve(count)
+        if delay:
+            time.sleep(delay)
+        return delay
\ No newline at end of file
@@ -0,0 +1,167 @@
+import threading
+import time
+from collections import deque
+from config import Config
+
+class HostState:
+    __slots__ = ('alive', 'last_seen', 'last_probe', 'next_probe', 'changed_at', 'misses', 'liveness')
+    
+    def __init__(self, now):
+        self.alive = False
+        self.last_seen = None
+        self.last_probe = now
+        self.next_probe = now
+        self.changed_at = now
+        self.misses = 0
+        self.liveness = 0.0
+
+class ScanScheduler:
+    def __init__(self, networks_source):
+        self.config = Config()
+        self.networks_source = networks_source
+        self.states = {}
+        self.lock = threading.Lock()
+        
+        self.sweep_iterator = None
+        self.universe_size = 0
+        self.sweep_credit = 0.0
+        self.last_tick = None
+        self.initial_sweep_done = False
+        
+        self.probe_total = 0
+        self.probe_window = deque()
+    
+    def _start_sweep(self):
+        networks = self.networks_source()
+        self.universe_size = sum(max(network.num_addresses - 2, 1) for network in networks)
+        self.sweep_iterator = (str(address) for network in networks for address in network.hosts())
+    
+    def _take_sweep_hosts(self, count):
+        hosts = []
+        restarted = False
+        while len(hosts) < count:
+            if self.sweep_iterator is None:
+                if restarted:
+                    break
+                self._start_sweep()
+                restarted = True
+            ip = next(self.sweep_iterator, None)
+            if ip is None:
+                self.sweep_iterator = None
+                continue
+            if ip not in self.states:
+                hosts.append(ip)
+        return hosts
+    
+    def _interval(self, state, now):
+        if now - state.changed_at < self.config.SCHEDULER_RECENT_CHANGE_WINDOW:
+            return self.config.SCHEDULER_RECENT_INTERVAL
+        if state.alive:
+            return self.config.SCHEDULER_LIVE_INTERVAL
+        return min(self.config.SCHEDULER_MAX_BACKOFF,
+                   self.config.SCHEDULER_LIVE_INTERVAL * 2 ** state.misses)
+    
+    def needs_initial_sweep(self):
+        return not self.initial_sweep_done
+    
+    def due_hosts(self, now=None):
+        if now is None:
+            now = time.monotonic()
+        with self.lock:
+            return [ip for ip, state in self.states.items() if state.next_probe <= now]
+    
+    def sweep_hosts(self, now=None):
+        if now is None:
+            now = time.monotonic()
+        
+        with self.lock:
+            if self.last_tick is not None and self.universe_size:
+                elapsed = now - self.last_tick
+                self.sweep_credit += self.universe_size * elapsed / self.config.SCHEDULER_SWEEP_PERIOD
+            self.last_tick = now
+            
+            if self.universe_size == 0:
+                self._start_sweep()
+            sweep_count = int(self.sweep_credit)
+            self.sweep_credit -= sweep_count
+            return self._take_sweep_hosts(sweep_count)
+    
+    def is_tracked(self, ip):
+        return ip in self.states
+    
+    def record_results(self, ips, results, now=None, probed=True):
+        if now is None:
+            now = time.monotonic()
+        alpha = self.config.SCHEDULER_LIVENESS_ALPHA
+        
+        with self.lock:
+            for ip in ips:
+                alive = ip in results
+                state = self.states.get(ip)
+                
+                if state is None:
+                    if not alive:
+                        continue
+                    state = self.states[ip] = HostState(now)
+                
+                if alive != state.alive:
+                    state.changed_at = now
+                state.alive = alive
+                state.last_probe = now
+                state.liveness += alpha * ((1.0 if alive else 0.0) - state.liveness)
+                
+                if alive:
+                    state.last_seen = now
+                    state.misses = 0
+                else:
+                    state.misses += 1
+                    if (state.misses >= self.config.SCHEDULER_FORGET_AFTER_MISSES
+                            and state.liveness < self.config.SCHEDULER_FORGET_LIVENESS):
+                        # Long-dead hosts fall back to the rolling background sweep
+                        del self.states[ip]
+                        continue
+                
+                state.next_probe = now + self._interval(state, now)
+            
+            if not probed:
+                # Passive sightings refresh host state but cost nothing against the probe budget
+                return
+            self.probe_total += len(ips)
+            self.probe_window.append((now, len(ips)))
+            horizon = now - self.config.SCHEDULER_SWEEP_PERIOD
+            while self.probe_window and self.probe_window[0][0] < horizon:
+                self.probe_window.popleft()
+    
+    def mark_full_sweep(self, now=None):
+        if now is None:
+            now = time.monotonic()
+        with self.lock:
+            self.initial_sweep_done = True
+            if self.last_tick is None:
+                self.last_tick = now
+    
+    def get_budget(self, now=None):
+        if now is None:
+            now = time.monotonic()
+        
+        with self.lock:
+            tracked = len(self.states)
+            live = sum(1 for state in self.states.values() if state.alive)
+            tracked_rate = sum(1.0 / self._interval(state, now) for state in self.states.values())
+            sweep_rate = self.universe_size / self.config.SCHEDULER_SWEEP_PERIOD
+            
+            if len(self.probe_window) > 1:
+                span = max(now - self.probe_window[0][0], 1e-6)
+                observed_rate = sum(count for _, count in self.probe_window) / span
+            else:
+                observed_rate = 0.0
+            
+            return {
+                'tracked_hosts': tracked,
+                'live_hosts': live,
+                'universe_size': self.universe_size,
+                'planned_probes_per_sec': tracked_rate + sweep_rate,
+                'observed_probes_per_sec': observed_rate,
+                'sweep_period': self.config.SCHEDULER_SWEEP_PERIOD,
+                'total_probes': self.probe_total
+            }
\ No newline at end of file
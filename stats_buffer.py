@@ -0,0 +1,82 @@
+import numpy as np
+
+class StatsRingBuffer:
+    COUNTER_FIELDS = ('bytes_sent', 'bytes_recv', 'packets_sent', 'packets_recv')
+    RATE_FIELDS = ('bytes_sent_rate', 'bytes_recv_rate', 'packets_sent_rate', 'packets_recv_rate')
+    FIELDS = ('timestamp',) + COUNTER_FIELDS + RATE_FIELDS
+    
+    def __init__(self, capacity):
+        self.capacity = capacity
+        # One slot more than is ever handed out, so the next append never lands inside a window a reader holds
+        self.slots = capacity + 1
+        # Every sample is written twice, so the latest N samples are always one contiguous slice
+        self.data = np.zeros((len(self.FIELDS), self.slots * 2), dtype=np.float64)
+        self.field_index = {name: i for i, name in enumerate(self.FIELDS)}
+        self.head = 0
+        self.count = 0
+    
+    def __len__(self):
+        return self.count
+    
+    def append(self, stats):
+        raw = np.array([stats['timestamp']] + [stats[name] for name in self.COUNTER_FIELDS], dtype=np.float64)
+        rates = np.zeros(len(self.RATE_FIELDS), dtype=np.float64)
+        
+        if self.count:
+            previous = self.data[:len(raw), self.head + self.slots - 1]
+            delta = raw - previous
+            if delta[0] > 0:
+                # Counters that went backwards were reset (interface re-created), not negative traffic
+                rates = np.maximum(delta[1:], 0) / delta[0]
+        
+        row = np.concatenate((raw, rates))
+        self.data[:, self.head] = row
+        self.data[:, self.head + self.slots] = row
+        self.head = (self.head + 1) % self.slots
+        self.count = min(self.count + 1, self.capacity)
+        return row
+    
+    def state(self):
+        return self.head, self.count
+    
+    def _window(self, count, state=None):
+        head, size = state if state is not None else (self.head, self.count)
+        if count is None or count > size:
+            count = size
+        end = head + self.slots
+        view = self.data[:, end - count:end]
+        view.flags.writeable = False
+        return view
+    
+    def columns(self, count=None, fields=None, state=None):
+        window = self._window(count, state)
+        return {name: window[self.field_index[name]] for name in (fields or self.FIELDS)}
+    
+    def latest(self):
+        if not self.count:
+            return None
+        row = self.data[:, self.head + self.slots - 1]
+        return {name: float(row[i]) for i, name in enumerate(self.FIELDS)}
+    
+    def to_dicts(self, count=None, state=None):
+        window = self._window(count, state)
+        return [{name: float(value) for name, value in zip(self.FIELDS, column)} for column in window.T]
+    
+    def resized(self, capacity):
+        window = self._window(capacity)
+        count = window.shape[1]
+        resized = type(self)(capacity)
+        resized.data[:, :count] = window
+        resized.data[:, resized.slots:resized.slots + count] = window
+        resized.head = count
+        resized.count = count
+        return resized
+    
+    def clear(self):
+        self.head = 0
+        self.count = 0
+
+class InterfaceStatsBuffer(StatsRingBuffer):
+    COUNTER_FIELDS = StatsRingBuffer.COUNTER_FIELDS + ('errin', 'errout', 'dropin', 'dropout')
+    RATE_FIELDS = StatsRingBuffer.RATE_FIELDS + ('errin_rate', 'errout_rate', 'dropin_rate', 'dropout_rate')
+    FIELDS = ('timestamp',) + COUNTER_FIELDS + RATE_FIELDS
\ No newline at end of file
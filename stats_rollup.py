@@ -0,0 +1,103 @@
+import math
+import numpy as np
+
+class RollupTier:
+    def __init__(self, resolution, capacity, field_count):
+        self.resolution = resolution
+        self.capacity = capacity
+        # Same double-write layout as StatsRingBuffer so any time window is one contiguous slice
+        self.starts = np.zeros(capacity * 2, dtype=np.float64)
+        self.counts = np.zeros(capacity * 2, dtype=np.float64)
+        self.mins = np.zeros((field_count, capacity * 2), dtype=np.float64)
+        self.maxs = np.zeros((field_count, capacity * 2), dtype=np.float64)
+        self.sums = np.zeros((field_count, capacity * 2), dtype=np.float64)
+        self.head = 0
+        self.size = 0
+    
+    def _last(self):
+        return (self.head - 1) % self.capacity
+    
+    def _write(self, slot, start, count, mins, maxs, sums):
+        for position in (slot, slot + self.capacity):
+            self.starts[position] = start
+            self.counts[position] = count
+            self.mins[:, position] = mins
+            self.maxs[:, position] = maxs
+            self.sums[:, position] = sums
+    
+    def add(self, timestamp, values):
+        start = math.floor(timestamp / self.resolution) * self.resolution
+        
+        if self.size and start <= self.starts[self._last()]:
+            slot = self._last()
+            self._write(slot, self.starts[slot], self.counts[slot] + 1,
+                        np.minimum(self.mins[:, slot], values),
+                        np.maximum(self.maxs[:, slot], values),
+                        self.sums[:, slot] + values)
+            return
+        
+        self._write(self.head, start, 1, values, values, values)
+        self.head = (self.head + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+    
+    def oldest(self):
+        if not self.size:
+            return None
+        return self.starts[self.head + self.capacity - self.size]
+    
+    def window(self, start, end):
+        first = self.head + self.capacity - self.size
+        last = self.head + self.capacity
+        starts = self.starts[first:last]
+        lo = first + np.searchsorted(starts, start - self.resolution, side='right')
+        hi = first + np.searchsorted(starts, end, side='right')
+        return slice(lo, hi)
+    
+    def clear(self):
+        self.head = 0
+        self.size = 0
+
+class RollupStore:
+    def __init__(self, fields, tiers):
+        self.fields = tuple(fields)
+        self.tiers = [RollupTier(resolution, capacity, len(self.fields))
+                      for resolution, capacity in sorted(tiers)]
+    
+    def add(self, timestamp, values):
+        values = np.asarray(values, dtype=np.float64)
+        for tier in self.tiers:
+            tier.add(timestamp, values)
+    
+    def _pick_tier(self, start, end, max_points):
+        for tier in self.tiers:
+            oldest = tier.oldest()
+            covers = oldest is not None and oldest <= start
+            if covers and (end - start) / tier.resolution <= max_points:
+                return tier
+        for tier in self.tiers:
+            if (end - start) / tier.resolution <= max_points:
+                return tier
+        return self.tiers[-1]
+    
+    def query(self, start, end, max_points):
+        tier = self._pick_tier(start, end, max_points)
+        window = tier.window(start, end)
+        counts = tier.counts[window]
+        result = {
+            'resolution': tier.resolution,
+            'timestamp': tier.starts[window].copy(),
+            'count': counts.copy()
+        }
+        divisor = np.where(counts > 0, counts, 1)
+        for i, name in enumerate(self.fields):
+            result[name] = {
+                'min': tier.mins[i, window].copy(),
+                'max': tier.maxs[i, window].copy(),
+                'sum': tier.sums[i, window].copy(),
+                'avg': tier.sums[i, window] / divisor
+            }
+        return result
+    
+    def clear(self):
+        for tier in self.tiers:
+            tier.clear()
\ No newline at end of file
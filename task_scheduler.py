@@ -0,0 +1,146 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+import metrics
+
+TASK_RUNS = metrics.REGISTRY.counter('enm_task_runs_total', 'Periodic task runs by outcome', ('task', 'outcome'))
+TASK_DURATION = metrics.REGISTRY.histogram('enm_task_duration_seconds', 'Periodic task run time',
+                                           ('task',), metrics.DURATION_BUCKETS)
+
+class PeriodicTask:
+    def __init__(self, name, function, interval, jitter):
+        self.name = name
+        self.function = function
+        self.interval = interval
+        self.jitter = jitter
+        self.next_slot = 0.0
+        self.due_at = 0.0
+        self.running = False
+        
+        self.runs = 0
+        self.skipped = 0
+        self.overruns = 0
+        self.errors = 0
+        self.last_error = None
+        self.last_duration = 0.0
+        self.max_duration = 0.0
+        self.total_duration = 0.0
+        self.max_lateness = 0.0
+    
+    def get_stats(self):
+        return {
+            'interval': self.interval,
+            'running': self.running,
+            'runs': self.runs,
+            'skipped': self.skipped,
+            'overruns': self.overruns,
+            'errors': self.errors,
+            'last_error': self.last_error,
+            'last_duration': self.last_duration,
+            'avg_duration': self.total_duration / self.runs if self.runs else 0.0,
+            'max_duration': self.max_duration,
+            'max_lateness': self.max_lateness
+        }
+
+class TaskScheduler:
+    def __init__(self):
+        self.config = Config()
+        self.tasks = []
+        self.stop_event = threading.Event()
+        self.dispatcher = None
+        self.executor = None
+    
+    def add_task(self, name, function, interval, jitter=None, delay=0.0):
+        if jitter is None:
+            jitter = interval * self.config.TASK_JITTER
+        task = PeriodicTask(name, function, interval, jitter)
+        task.next_slot = delay
+        self.tasks.append(task)
+        return task
+    
+    def is_running(self):
+        return self.dispatcher is not None and self.dispatcher.is_alive()
+    
+    def start(self):
+        if self.is_running() or not self.tasks:
+            return
+        now = time.monotonic()
+        for task in self.tasks:
+            task.next_slot = now + task.next_slot
+            task.due_at = task.next_slot
+        # One worker per task: with skip-if-running no task can ever queue behind another
+        self.executor = ThreadPoolExecutor(max_workers=len(self.tasks), thread_name_prefix='task')
+        self.stop_event.clear()
+        self.dispatcher = threading.Thread(target=self._dispatch_loop, daemon=True)
+        self.dispatcher.start()
+    
+    def stop(self, timeout=2.0):
+        self.stop_event.set()
+        if self.dispatcher:
+            self.dispatcher.join(timeout=timeout)
+            self.dispatcher = None
+        if self.executor:
+            deadline = time.monotonic() + timeout
+            while any(task.running for task in self.tasks) and time.monotonic() < deadline:
+                time.sleep(0.05)
+            self.executor.shutdown(wait=False)
+            self.executor = None
+    
+    def _dispatch_loop(self):
+        while not self.stop_event.is_set():
+            now = time.monotonic()
+            for task in self.tasks:
+                if now >= task.due_at:
+                    self._dispatch(task, now)
+            next_due = min(task.due_at for task in self.tasks)
+            self.stop_event.wait(max(0.0, next_due - time.monotonic()))
+    
+    def _dispatch(self, task, now):
+        slot = task.next_slot
+        # Slots stay on a fixed grid from start(), so run time and jitter never accumulate as drift
+        missed = int((now - slot) // task.interval)
+        task.next_slot = slot + (missed + 1) * task.interval
+        task.due_at = task.next_slot + random.uniform(0, task.jitter)
+        
+        if task.running:
+            task.skipped += 1
+            TASK_RUNS.labels(task.name, 'skipped').inc()
+            return
+        if missed:
+            task.skipped += missed
+            TASK_RUNS.labels(task.name, 'skipped').inc(missed)
+        
+        task.running = True
+        task.max_lateness = max(task.max_lateness, now - slot - missed * task.interval)
+        try:
+            self.executor.submit(self._execute, task)
+        except RuntimeError:
+            task.running = False
+    
+    def _execute(self, task):
+        started = time.monotonic()
+        outcome = 'ok'
+        try:
+            task.function()
+        except Exception as e:
+            outcome = 'error'
+            task.errors += 1
+            task.last_error = str(e)
+            print(f"Task {task.name} failed: {e}")
+        finally:
+            duration = time.monotonic() - started
+            task.runs += 1
+            task.last_duration = duration
+            task.total_duration += duration
+            task.max_duration = max(task.max_duration, duration)
+            if duration > task.interval:
+                task.overruns += 1
+                outcome = 'overrun' if outcome == 'ok' else outcome
+            TASK_RUNS.labels(task.name, outcome).inc()
+            TASK_DURATION.labels(task.name).observe(duration)
+            task.running = False
+    
+    def get_stats(self):
+        return {task.name: task.get_stats() for task in self.tasks}
\ No newline at end of file